@@ -1,12 +1,28 @@
-from azure.ai.textanalytics import TextAnalyticsClient
+from azure.ai.textanalytics import (
+    TextAnalyticsClient,
+    RecognizeEntitiesAction,
+    AnalyzeSentimentAction,
+    ExtractKeyPhrasesAction
+)
+from azure.ai.textanalytics.aio import TextAnalyticsClient as AsyncTextAnalyticsClient
 from azure.core.credentials import AzureKeyCredential
 from app.config import settings
+from app.cache.nlp_cache import NLPAnalysisCache
+from app.agents.keyword_matcher import KeywordMatcher, load_keyword_tables
 from app.schemas.ticket import TicketIntentClassification, TicketPriority
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Per-request document limits of the Text Analytics service
+ENTITY_BATCH_LIMIT = 5
+SENTIMENT_BATCH_LIMIT = 10
+KEY_PHRASE_BATCH_LIMIT = 10
+ANALYZE_ACTIONS_BATCH_LIMIT = 25
+
 
 class AzureNLPAgent:
     
@@ -15,16 +31,137 @@ class AzureNLPAgent:
             endpoint=settings.azure_text_analytics_endpoint,
             credential=AzureKeyCredential(settings.azure_text_analytics_key)
         )
+        self.async_client = AsyncTextAnalyticsClient(
+            endpoint=settings.azure_text_analytics_endpoint,
+            credential=AzureKeyCredential(settings.azure_text_analytics_key)
+        )
+        self.analysis_mode = settings.azure_nlp_analysis_mode
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="azure-nlp")
+        self.keyword_matcher = KeywordMatcher(load_keyword_tables(settings.nlp_keywords_path))
+        
+        self.cache: Optional[NLPAnalysisCache] = None
+        if settings.nlp_cache_enabled:
+            self.cache = NLPAnalysisCache(
+                max_entries=settings.nlp_cache_max_entries,
+                ttl_seconds=settings.nlp_cache_ttl_seconds,
+                persist=settings.nlp_cache_persist
+            )
     
     def analyze_ticket(self, title: str, description: str) -> TicketIntentClassification:
+        cached = self.get_cached(title, description)
+        if cached is not None:
+            return cached
+        
+        text = f"{title}. {description}"
+        
+        entities, sentiment, key_phrases = self._analyze_texts([text])[0]
+        result = self._build_classification(entities, sentiment, key_phrases)
+        
+        if self.cache:
+            self.cache.set(title, description, result)
+        
+        return result
+    
+    async def aanalyze_ticket(self, title: str, description: str) -> TicketIntentClassification:
+        cached = await self.aget_cached(title, description)
+        if cached is not None:
+            return cached
+        
         text = f"{title}. {description}"
         
-        entities = self._extract_entities(text)
-        sentiment = self._analyze_sentiment(text)
-        key_phrases = self._extract_key_phrases(text)
+        entities, sentiment, key_phrases = (await self._aanalyze_texts([text]))[0]
+        result = self._build_classification(entities, sentiment, key_phrases)
+        
+        if self.cache:
+            await self.cache.aset(title, description, result)
+        
+        return result
+    
+    def classify_with_intent(
+        self,
+        title: str,
+        description: str,
+        intent: str,
+        confidence: float
+    ) -> TicketIntentClassification:
+        cached = self.get_cached(title, description)
+        if cached is not None:
+            return cached
+        
+        return self._build_local_classification(f"{title}. {description}", intent, confidence)
+    
+    async def aclassify_with_intent(
+        self,
+        title: str,
+        description: str,
+        intent: str,
+        confidence: float
+    ) -> TicketIntentClassification:
+        cached = await self.aget_cached(title, description)
+        if cached is not None:
+            return cached
+        
+        return self._build_local_classification(f"{title}. {description}", intent, confidence)
+    
+    def get_cached(self, title: str, description: str) -> Optional[TicketIntentClassification]:
+        if not self.cache:
+            return None
+        
+        cached = self.cache.get(title, description)
+        if cached is not None:
+            logger.info(f"Azure NLP cache hit: intent={cached.intent}, priority={cached.priority}")
+        return cached
+    
+    async def aget_cached(self, title: str, description: str) -> Optional[TicketIntentClassification]:
+        if not self.cache:
+            return None
+        
+        cached = await self.cache.aget(title, description)
+        if cached is not None:
+            logger.info(f"Azure NLP cache hit: intent={cached.intent}, priority={cached.priority}")
+        return cached
+    
+    def analyze_tickets(self, tickets: List[Dict]) -> List[TicketIntentClassification]:
+        results: List[Optional[TicketIntentClassification]] = [None] * len(tickets)
+        pending = []
+        
+        for i, ticket in enumerate(tickets):
+            if self.cache:
+                results[i] = self.cache.get(ticket["title"], ticket["description"])
+            if results[i] is None:
+                pending.append(i)
         
-        intent, confidence = self._classify_intent(key_phrases, entities)
-        priority = self._determine_priority(sentiment, key_phrases, entities)
+        logger.info(f"Analyzing batch of {len(tickets)} tickets ({len(pending)} uncached, mode={self.analysis_mode})")
+        
+        texts = [f"{tickets[i]['title']}. {tickets[i]['description']}" for i in pending]
+        
+        for i, (entities, sentiment, key_phrases) in zip(pending, self._analyze_texts(texts)):
+            results[i] = self._build_classification(entities, sentiment, key_phrases)
+            
+            if self.cache:
+                self.cache.set(tickets[i]["title"], tickets[i]["description"], results[i])
+        
+        return results
+    
+    def get_stats(self) -> Dict:
+        return {
+            "analysis_mode": self.analysis_mode,
+            "cache": self.cache.get_stats() if self.cache else None
+        }
+    
+    async def aclose(self):
+        await self.async_client.close()
+    
+    def _build_classification(
+        self,
+        entities: List[Dict],
+        sentiment: str,
+        key_phrases: List[str]
+    ) -> TicketIntentClassification:
+        scores = self.keyword_matcher.match(key_phrases)
+        
+        intent, confidence = self._classify_intent(scores["intents"], entities)
+        priority = self._determine_priority(sentiment, scores["priority"], entities)
         
         logger.info(f"Azure NLP analysis complete: intent={intent}, priority={priority}, confidence={confidence}")
         
@@ -36,98 +173,239 @@ class AzureNLPAgent:
             priority=priority
         )
     
-    def _extract_entities(self, text: str) -> List[Dict]:
-        try:
-            response = self.client.recognize_entities([text])[0]
-            
-            if response.is_error:
-                logger.error(f"Entity extraction error: {response.error}")
-                return []
-            
-            entities = []
-            for entity in response.entities:
-                entities.append({
-                    "text": entity.text,
-                    "category": entity.category,
-                    "subcategory": entity.subcategory,
-                    "confidence": entity.confidence_score
-                })
-            
-            return entities
-            
-        except Exception as e:
-            logger.error(f"Entity extraction failed: {e}")
-            return []
+    def _build_local_classification(self, text: str, intent: str, confidence: float) -> TicketIntentClassification:
+        scores = self.keyword_matcher.match([text])
+        sentiment = self._keyword_sentiment(scores.get("sentiment", {}))
+        
+        return TicketIntentClassification(
+            intent=intent,
+            confidence=confidence,
+            entities=[],
+            sentiment=sentiment,
+            priority=self._determine_priority(sentiment, scores["priority"], [])
+        )
     
-    def _analyze_sentiment(self, text: str) -> str:
-        try:
-            response = self.client.analyze_sentiment([text])[0]
-            
-            if response.is_error:
-                logger.error(f"Sentiment analysis error: {response.error}")
-                return "neutral"
-            
-            return response.sentiment
+    def _analyze_texts(self, texts: List[str]) -> List[Tuple[List[Dict], str, List[str]]]:
+        if self.analysis_mode == "actions":
+            try:
+                return self._analyze_with_actions(texts)
+            except Exception as e:
+                logger.warning(f"Multi-action analysis failed, falling back to concurrent calls: {e}")
+        
+        if self.analysis_mode == "sequential":
+            entities = self._extract_entities(texts)
+            sentiments = self._analyze_sentiment(texts)
+            key_phrases = self._extract_key_phrases(texts)
+        else:
+            entities_future = self.executor.submit(self._extract_entities, texts)
+            sentiments_future = self.executor.submit(self._analyze_sentiment, texts)
+            key_phrases_future = self.executor.submit(self._extract_key_phrases, texts)
             
-        except Exception as e:
-            logger.error(f"Sentiment analysis failed: {e}")
-            return "neutral"
+            entities = entities_future.result()
+            sentiments = sentiments_future.result()
+            key_phrases = key_phrases_future.result()
+        
+        return list(zip(entities, sentiments, key_phrases))
     
-    def _extract_key_phrases(self, text: str) -> List[str]:
-        try:
-            response = self.client.extract_key_phrases([text])[0]
-            
-            if response.is_error:
-                logger.error(f"Key phrase extraction error: {response.error}")
-                return []
+    async def _aanalyze_texts(self, texts: List[str]) -> List[Tuple[List[Dict], str, List[str]]]:
+        if self.analysis_mode == "actions":
+            try:
+                return await self._aanalyze_with_actions(texts)
+            except Exception as e:
+                logger.warning(f"Multi-action analysis failed, falling back to concurrent calls: {e}")
+        
+        if self.analysis_mode == "sequential":
+            entities = await self._aextract_entities(texts)
+            sentiments = await self._aanalyze_sentiment(texts)
+            key_phrases = await self._aextract_key_phrases(texts)
+        else:
+            entities, sentiments, key_phrases = await asyncio.gather(
+                self._aextract_entities(texts),
+                self._aanalyze_sentiment(texts),
+                self._aextract_key_phrases(texts)
+            )
+        
+        return list(zip(entities, sentiments, key_phrases))
+    
+    def _analyze_with_actions(self, texts: List[str]) -> List[Tuple[List[Dict], str, List[str]]]:
+        results = []
+        
+        for chunk in self._chunk(texts, ANALYZE_ACTIONS_BATCH_LIMIT):
+            poller = self.client.begin_analyze_actions(
+                chunk,
+                actions=[
+                    RecognizeEntitiesAction(),
+                    AnalyzeSentimentAction(),
+                    ExtractKeyPhrasesAction()
+                ]
+            )
             
-            return list(response.key_phrases)
+            for entities_result, sentiment_result, key_phrases_result in poller.result():
+                results.append((
+                    self._parse_entities(entities_result),
+                    self._parse_sentiment(sentiment_result),
+                    self._parse_key_phrases(key_phrases_result)
+                ))
+        
+        return results
+    
+    async def _aanalyze_with_actions(self, texts: List[str]) -> List[Tuple[List[Dict], str, List[str]]]:
+        results = []
+        
+        for chunk in self._chunk(texts, ANALYZE_ACTIONS_BATCH_LIMIT):
+            poller = await self.async_client.begin_analyze_actions(
+                chunk,
+                actions=[
+                    RecognizeEntitiesAction(),
+                    AnalyzeSentimentAction(),
+                    ExtractKeyPhrasesAction()
+                ]
+            )
             
-        except Exception as e:
-            logger.error(f"Key phrase extraction failed: {e}")
-            return []
+            async for entities_result, sentiment_result, key_phrases_result in await poller.result():
+                results.append((
+                    self._parse_entities(entities_result),
+                    self._parse_sentiment(sentiment_result),
+                    self._parse_key_phrases(key_phrases_result)
+                ))
+        
+        return results
     
-    def _classify_intent(self, key_phrases: List[str], entities: List[Dict]) -> tuple[str, float]:
-        key_phrases_lower = [kp.lower() for kp in key_phrases]
+    def _extract_entities(self, texts: List[str]) -> List[List[Dict]]:
+        results = []
         
-        intent_keywords = {
-            "password_reset": ["password", "reset", "forgot", "login", "access", "credentials"],
-            "technical_issue": ["error", "bug", "crash", "broken", "not working", "failed"],
-            "account_issue": ["account", "billing", "subscription", "payment", "invoice"],
-            "feature_request": ["feature", "request", "need", "add", "implement", "enhancement"],
-            "question": ["how", "what", "why", "when", "where", "question", "help"],
-            "complaint": ["slow", "bad", "worst", "disappointed", "frustrated", "unhappy"]
-        }
+        for chunk in self._chunk(texts, ENTITY_BATCH_LIMIT):
+            try:
+                responses = self.client.recognize_entities(chunk)
+                results.extend(self._parse_entities(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Entity extraction failed: {e}")
+                results.extend([] for _ in chunk)
         
-        intent_scores = {}
+        return results
+    
+    def _analyze_sentiment(self, texts: List[str]) -> List[str]:
+        results = []
         
-        for intent, keywords in intent_keywords.items():
-            score = 0
-            for keyword in keywords:
-                if any(keyword in phrase for phrase in key_phrases_lower):
-                    score += 1
-            
-            if score > 0:
-                intent_scores[intent] = score
+        for chunk in self._chunk(texts, SENTIMENT_BATCH_LIMIT):
+            try:
+                responses = self.client.analyze_sentiment(chunk)
+                results.extend(self._parse_sentiment(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Sentiment analysis failed: {e}")
+                results.extend("neutral" for _ in chunk)
+        
+        return results
+    
+    def _extract_key_phrases(self, texts: List[str]) -> List[List[str]]:
+        results = []
+        
+        for chunk in self._chunk(texts, KEY_PHRASE_BATCH_LIMIT):
+            try:
+                responses = self.client.extract_key_phrases(chunk)
+                results.extend(self._parse_key_phrases(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Key phrase extraction failed: {e}")
+                results.extend([] for _ in chunk)
+        
+        return results
+    
+    async def _aextract_entities(self, texts: List[str]) -> List[List[Dict]]:
+        results = []
+        
+        for chunk in self._chunk(texts, ENTITY_BATCH_LIMIT):
+            try:
+                responses = await self.async_client.recognize_entities(chunk)
+                results.extend(self._parse_entities(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Entity extraction failed: {e}")
+                results.extend([] for _ in chunk)
         
+        return results
+    
+    async def _aanalyze_sentiment(self, texts: List[str]) -> List[str]:
+        results = []
+        
+        for chunk in self._chunk(texts, SENTIMENT_BATCH_LIMIT):
+            try:
+                responses = await self.async_client.analyze_sentiment(chunk)
+                results.extend(self._parse_sentiment(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Sentiment analysis failed: {e}")
+                results.extend("neutral" for _ in chunk)
+        
+        return results
+    
+    async def _aextract_key_phrases(self, texts: List[str]) -> List[List[str]]:
+        results = []
+        
+        for chunk in self._chunk(texts, KEY_PHRASE_BATCH_LIMIT):
+            try:
+                responses = await self.async_client.extract_key_phrases(chunk)
+                results.extend(self._parse_key_phrases(response) for response in responses)
+            except Exception as e:
+                logger.error(f"Key phrase extraction failed: {e}")
+                results.extend([] for _ in chunk)
+        
+        return results
+    
+    def _parse_entities(self, response) -> List[Dict]:
+        if response.is_error:
+            logger.error(f"Entity extraction error: {response.error}")
+            return []
+        
+        entities = []
+        for entity in response.entities:
+            entities.append({
+                "text": entity.text,
+                "category": entity.category,
+                "subcategory": entity.subcategory,
+                "confidence": entity.confidence_score
+            })
+        
+        return entities
+    
+    def _parse_sentiment(self, response) -> str:
+        if response.is_error:
+            logger.error(f"Sentiment analysis error: {response.error}")
+            return "neutral"
+        
+        return response.sentiment
+    
+    def _parse_key_phrases(self, response) -> List[str]:
+        if response.is_error:
+            logger.error(f"Key phrase extraction error: {response.error}")
+            return []
+        
+        return list(response.key_phrases)
+    
+    @staticmethod
+    def _chunk(texts: List[str], size: int) -> List[List[str]]:
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+    
+    def _classify_intent(self, intent_scores: Dict[str, int], entities: List[Dict]) -> tuple[str, float]:
         if not intent_scores:
             return ("general_inquiry", 0.5)
         
         best_intent = max(intent_scores, key=intent_scores.get)
         max_score = intent_scores[best_intent]
-        total_keywords = len(intent_keywords[best_intent])
+        total_keywords = self.keyword_matcher.label_sizes[("intents", best_intent)]
         confidence = min(0.5 + (max_score / total_keywords) * 0.5, 0.95)
         
         return (best_intent, confidence)
     
-    def _determine_priority(self, sentiment: str, key_phrases: List[str], entities: List[Dict]) -> TicketPriority:
-        key_phrases_lower = [kp.lower() for kp in key_phrases]
-        
-        urgent_keywords = ["urgent", "emergency", "critical", "asap", "immediately", "down", "outage"]
-        high_keywords = ["important", "priority", "soon", "blocked", "cannot", "unable"]
-        
-        has_urgent = any(keyword in phrase for phrase in key_phrases_lower for keyword in urgent_keywords)
-        has_high = any(keyword in phrase for phrase in key_phrases_lower for keyword in high_keywords)
+    @staticmethod
+    def _keyword_sentiment(sentiment_scores: Dict[str, int]) -> str:
+        if "negative" in sentiment_scores:
+            return "negative"
+        elif "positive" in sentiment_scores:
+            return "positive"
+        else:
+            return "neutral"
+    
+    def _determine_priority(self, sentiment: str, priority_scores: Dict[str, int], entities: List[Dict]) -> TicketPriority:
+        has_urgent = "urgent" in priority_scores
+        has_high = "high" in priority_scores
         
         if has_urgent or sentiment == "negative":
             return TicketPriority.URGENT
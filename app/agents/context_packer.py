@@ -0,0 +1,97 @@
+from app.embeddings.embed import EmbeddingGenerator
+from app.schemas.response import KBDocument
+from typing import List, Optional
+import numpy as np
+import math
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+class ContextPacker:
+    
+    def __init__(
+        self,
+        embedding_generator: EmbeddingGenerator,
+        token_budget: int,
+        duplicate_threshold: float = 0.92
+    ):
+        self.embedding_generator = embedding_generator
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+    
+    def pack(
+        self,
+        query_text: str,
+        kb_documents: List[KBDocument],
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[KBDocument]:
+        if not kb_documents:
+            return kb_documents
+        
+        if sum(estimate_tokens(doc.content) for doc in kb_documents) <= self.token_budget:
+            return kb_documents
+        
+        passages = []
+        for doc_index, doc in enumerate(kb_documents):
+            for sentence in SENTENCE_BOUNDARY.split(doc.content):
+                if sentence.strip():
+                    passages.append((doc_index, sentence.strip()))
+        
+        if not passages:
+            return kb_documents
+        
+        if query_embedding is None:
+            query_embedding = self.embedding_generator.embed(query_text)
+        
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        sentences = self._normalize(self.embedding_generator.embed_batch([text for _, text in passages]))
+        
+        doc_weights = np.array([kb_documents[doc_index].similarity_score for doc_index, _ in passages], dtype=np.float32)
+        scores = (sentences @ query) * doc_weights
+        
+        selected: List[int] = []
+        remaining = self.token_budget
+        duplicates = 0
+        
+        for passage_index in np.argsort(-scores):
+            tokens = estimate_tokens(passages[passage_index][1])
+            if tokens > remaining:
+                continue
+            
+            if selected and float(np.max(sentences[selected] @ sentences[passage_index])) >= self.duplicate_threshold:
+                duplicates += 1
+                continue
+            
+            selected.append(int(passage_index))
+            remaining -= tokens
+        
+        if not selected:
+            doc_index, text = passages[int(np.argmax(scores))]
+            logger.info(f"Every KB passage exceeds the {self.token_budget} token budget, truncating the best match")
+            return [kb_documents[doc_index].model_copy(update={"content": text[:max(self.token_budget, 1) * 4]})]
+        
+        packed = []
+        for doc_index, doc in enumerate(kb_documents):
+            kept = [passages[i][1] for i in sorted(selected) if passages[i][0] == doc_index]
+            if kept:
+                packed.append(doc.model_copy(update={"content": " ".join(kept)}))
+        
+        logger.info(
+            f"Packed KB context into {self.token_budget} tokens: {len(packed)}/{len(kb_documents)} docs, "
+            f"{len(selected)}/{len(passages)} passages, {duplicates} duplicates dropped"
+        )
+        
+        return packed
+    
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
@@ -1,38 +1,137 @@
-import requests
+import httpx
 from app.config import settings
+from app.llm.router import OllamaRouter
+from app.llm.admission import AdmissionController
+from app.llm.warmup import ModelWarmer
+from app.llm.cascade import ModelCascade, LARGE_TIER
+from app.llm.budgets import GenerationBudgets
+from app.llm.breaker import CircuitBreaker
+from app.agents.context_packer import ContextPacker, estimate_tokens
 from app.schemas.response import KBDocument
-from typing import List
+from typing import List, AsyncIterator, Dict, Optional
+from contextlib import aclosing, nullcontext
+import numpy as np
+import asyncio
+import time
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+_PROMPT_PREFIX = """You are a customer support agent helping resolve a support ticket.
+
+Instructions:
+- Provide a clear, helpful response to the user's issue
+- Base your answer on the knowledge base articles provided when relevant
+- Be professional, empathetic, and concise
+- If the knowledge base doesn't have sufficient information, acknowledge this and suggest next steps
+- Do not make up information not present in the knowledge base
+- Keep the response under 300 words
+
+"""
+
 
 class DraftingAgent:
     
-    def __init__(self):
-        self.ollama_url = f"{settings.ollama_base_url}/api/generate"
-        self.model = "qwen2.5:3b"
+    def __init__(self, context_packer: Optional[ContextPacker] = None):
+        self.context_packer = context_packer
+        self.router = OllamaRouter(settings.get_ollama_backend_urls())
+        self.admission = AdmissionController(
+            capacity=lambda: settings.llm_concurrency_per_backend * max(self.router.available_count(), 1),
+            deadline_seconds=settings.llm_admission_deadline_seconds,
+            initial_service_seconds=settings.llm_initial_service_seconds
+        )
+        self.model = settings.llm_model
+        self.cascade = ModelCascade(
+            small_model=settings.llm_small_model if settings.llm_cascade_enabled else None,
+            large_model=self.model,
+            simple_intents=settings.get_csv_setting("llm_cascade_simple_intents"),
+            large_priorities=settings.get_csv_setting("llm_cascade_large_priorities"),
+            min_similarity=settings.llm_cascade_min_similarity,
+            escalation_threshold=settings.llm_cascade_escalation_threshold
+        )
+        self.budgets = GenerationBudgets(
+            default_tokens=settings.llm_max_tokens,
+            min_tokens=settings.llm_budget_min_tokens,
+            percentile=settings.llm_budget_percentile,
+            margin=settings.llm_budget_margin,
+            min_samples=settings.llm_budget_min_samples,
+            history_limit=settings.llm_budget_history_limit,
+            refresh_seconds=settings.llm_budget_refresh_seconds
+        )
+        self.breaker = CircuitBreaker(
+            window_size=settings.llm_breaker_window,
+            min_calls=settings.llm_breaker_min_calls,
+            failure_rate_threshold=settings.llm_breaker_failure_rate,
+            slow_call_seconds=settings.llm_breaker_slow_call_seconds,
+            slow_call_rate_threshold=settings.llm_breaker_slow_call_rate,
+            open_seconds=settings.llm_breaker_open_seconds,
+            half_open_probes=settings.llm_breaker_half_open_probes
+        )
+        self.warmer = ModelWarmer(
+            router=self.router,
+            build_payloads=lambda: [
+                self._build_payload(_PROMPT_PREFIX, 1, model=model)
+                for model in self.cascade.models.values() if model
+            ],
+            refresh_seconds=settings.ollama_keep_alive_refresh_seconds
+        )
     
     def draft_response(
         self,
         ticket_title: str,
         ticket_description: str,
         intent: str,
-        kb_documents: List[KBDocument]
+        kb_documents: List[KBDocument],
+        priority: str = "medium",
+        query_embedding: Optional[np.ndarray] = None
+    ) -> tuple[str, float]:
+        logger.info(f"Drafting response for intent: {intent}")
+        
+        prompt = self._build_packed_prompt(ticket_title, ticket_description, intent, kb_documents, query_embedding)
+        
+        try:
+            tier = self.cascade.choose_tier(intent, kb_documents, priority)
+            response_text, confidence = self._generate(prompt, intent, kb_documents, tier)
+            
+            if self.cascade.should_escalate(tier, confidence):
+                self.cascade.record_escalation(confidence)
+                response_text, confidence = self._generate(prompt, intent, kb_documents, LARGE_TIER)
+            
+            logger.info(f"Response drafted with confidence: {confidence:.2f}")
+            return response_text, confidence
+            
+        except Exception as e:
+            logger.error(f"Failed to draft response: {e}")
+            raise
+    
+    async def adraft_response(
+        self,
+        ticket_title: str,
+        ticket_description: str,
+        intent: str,
+        kb_documents: List[KBDocument],
+        priority: str = "medium",
+        query_embedding: Optional[np.ndarray] = None
     ) -> tuple[str, float]:
         logger.info(f"Drafting response for intent: {intent}")
         
-        prompt = self._build_prompt(
-            ticket_title=ticket_title,
-            ticket_description=ticket_description,
-            intent=intent,
-            kb_documents=kb_documents
+        prompt = await asyncio.to_thread(
+            self._build_packed_prompt, ticket_title, ticket_description, intent, kb_documents, query_embedding
         )
         
         try:
-            response_text = self._call_ollama(prompt)
-            confidence = self._calculate_confidence(kb_documents, response_text)
+            tier = self.cascade.choose_tier(intent, kb_documents, priority)
+            
+            if settings.llm_breaker_enabled:
+                self.breaker.raise_if_open()
+            
+            async with self.admission.admit(priority):
+                response_text, confidence = await self._agenerate(prompt, intent, kb_documents, tier)
+                
+                if self.cascade.should_escalate(tier, confidence):
+                    self.cascade.record_escalation(confidence)
+                    response_text, confidence = await self._agenerate(prompt, intent, kb_documents, LARGE_TIER)
             
             logger.info(f"Response drafted with confidence: {confidence:.2f}")
             return response_text, confidence
@@ -41,6 +140,119 @@ class DraftingAgent:
             logger.error(f"Failed to draft response: {e}")
             raise
     
+    def get_stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "cascade": self.cascade.get_stats(),
+            "backends": self.router.get_stats(),
+            "warmup": self.warmer.get_stats(),
+            "budgets": self.budgets.get_stats(),
+            "breaker": self.breaker.get_stats(),
+            "hedging": self.router.get_hedging_stats(),
+            "admission": self.admission.get_stats()
+        }
+    
+    def start_background_tasks(self):
+        self.router.start_health_checks()
+        if settings.ollama_warmup_enabled:
+            self.warmer.start()
+        if settings.llm_budget_enabled:
+            self.budgets.start()
+    
+    async def aclose(self):
+        await self.budgets.stop()
+        await self.warmer.stop()
+        await self.router.aclose()
+    
+    async def astream_response(
+        self,
+        ticket_title: str,
+        ticket_description: str,
+        intent: str,
+        kb_documents: List[KBDocument],
+        priority: str = "medium",
+        query_embedding: Optional[np.ndarray] = None
+    ) -> AsyncIterator[str]:
+        logger.info(f"Streaming response for intent: {intent}")
+        
+        prompt = await asyncio.to_thread(
+            self._build_packed_prompt, ticket_title, ticket_description, intent, kb_documents, query_embedding
+        )
+        
+        tier = self.cascade.choose_tier(intent, kb_documents, priority)
+        
+        if settings.llm_breaker_enabled:
+            self.breaker.raise_if_open()
+        
+        async with self.admission.admit(priority):
+            start = time.monotonic()
+            stream = self._astream_ollama(
+                prompt,
+                max_tokens=self.budgets.budget_for(intent),
+                model=self.cascade.model_for(tier)
+            )
+            with self._guard():
+                async with aclosing(stream) as tokens:
+                    async for token in tokens:
+                        yield token
+            self.cascade.record(tier, time.monotonic() - start)
+    
+    def _guard(self):
+        return self.breaker.guard() if settings.llm_breaker_enabled else nullcontext()
+    
+    def _generate(self, prompt: str, intent: str, kb_documents: List[KBDocument], tier: str) -> tuple[str, float]:
+        start = time.monotonic()
+        with self._guard():
+            response_text = self._call_ollama(
+                prompt,
+                max_tokens=self.budgets.budget_for(intent),
+                model=self.cascade.model_for(tier)
+            )
+        self.cascade.record(tier, time.monotonic() - start)
+        
+        return response_text, self._calculate_confidence(kb_documents, response_text)
+    
+    async def _agenerate(self, prompt: str, intent: str, kb_documents: List[KBDocument], tier: str) -> tuple[str, float]:
+        start = time.monotonic()
+        with self._guard():
+            response_text = await self._acall_ollama(
+                prompt,
+                max_tokens=self.budgets.budget_for(intent),
+                model=self.cascade.model_for(tier)
+            )
+        self.cascade.record(tier, time.monotonic() - start)
+        
+        return response_text, self._calculate_confidence(kb_documents, response_text)
+    
+    def _build_packed_prompt(
+        self,
+        ticket_title: str,
+        ticket_description: str,
+        intent: str,
+        kb_documents: List[KBDocument],
+        query_embedding: Optional[np.ndarray]
+    ) -> str:
+        prompt = self._build_prompt(ticket_title, ticket_description, intent, kb_documents)
+        if not self.context_packer or not kb_documents:
+            return prompt
+        
+        try:
+            packed_documents = self.context_packer.pack(
+                query_text=f"{ticket_title}\n{ticket_description}",
+                kb_documents=kb_documents,
+                query_embedding=query_embedding
+            )
+        except Exception as e:
+            logger.warning(f"Context packing failed, using full KB documents: {e}")
+            return prompt
+        
+        if packed_documents is kb_documents:
+            return prompt
+        
+        packed_prompt = self._build_prompt(ticket_title, ticket_description, intent, packed_documents)
+        logger.info(f"Packed prompt: {estimate_tokens(prompt)} -> {estimate_tokens(packed_prompt)} tokens")
+        return packed_prompt
+    
     def _build_prompt(
         self,
         ticket_title: str,
@@ -57,57 +269,90 @@ class DraftingAgent:
         else:
             context = "No specific knowledge base articles found for this issue.\n\n"
         
-        prompt = f"""You are a customer support agent helping resolve a support ticket.
-
-Ticket Title: {ticket_title}
+        prompt = f"""{_PROMPT_PREFIX}{context}Ticket Title: {ticket_title}
 Ticket Description: {ticket_description}
 Classified Intent: {intent}
 
-{context}
-
-Instructions:
-- Provide a clear, helpful response to the user's issue
-- Base your answer on the knowledge base articles provided when relevant
-- Be professional, empathetic, and concise
-- If the knowledge base doesn't have sufficient information, acknowledge this and suggest next steps
-- Do not make up information not present in the knowledge base
-- Keep the response under 300 words
-
 Response:"""
         
         return prompt
     
-    def _call_ollama(self, prompt: str, max_tokens: int = 500) -> str:
-        try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": 0.7,
-                    "top_p": 0.9
-                }
+    def _build_payload(self, prompt: str, max_tokens: int, stream: bool = False, model: Optional[str] = None) -> dict:
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                "num_predict": max_tokens,
+                "num_ctx": settings.llm_num_ctx,
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "stop": self.budgets.stop_sequences()
             }
+        }
+    
+    def _call_ollama(self, prompt: str, max_tokens: Optional[int] = None, model: Optional[str] = None) -> str:
+        try:
+            payload = self._build_payload(prompt, max_tokens or settings.llm_max_tokens, model=model)
             
-            response = requests.post(
-                self.ollama_url,
-                json=payload,
-                timeout=settings.request_timeout_seconds
-            )
+            result = self.router.generate(payload)
             
-            response.raise_for_status()
-            result = response.json()
+            return result.get("response", "").strip()
+            
+        except httpx.TimeoutException:
+            logger.error("Ollama request timed out")
+            raise Exception("LLM request timed out")
+        except httpx.HTTPError as e:
+            logger.error(f"Ollama request failed: {e}")
+            raise Exception(f"Failed to connect to LLM: {e}")
+    
+    async def _acall_ollama(self, prompt: str, max_tokens: Optional[int] = None, model: Optional[str] = None) -> str:
+        if settings.llm_hedging_enabled:
+            async with aclosing(self._astream_ollama(prompt, max_tokens, model)) as tokens:
+                return "".join([token async for token in tokens]).strip()
+        
+        try:
+            payload = self._build_payload(prompt, max_tokens or settings.llm_max_tokens, model=model)
+            
+            result = await self.router.agenerate(payload)
             
             return result.get("response", "").strip()
             
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.error("Ollama request timed out")
             raise Exception("LLM request timed out")
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Ollama request failed: {e}")
             raise Exception(f"Failed to connect to LLM: {e}")
     
+    async def _astream_ollama(self, prompt: str, max_tokens: Optional[int] = None, model: Optional[str] = None) -> AsyncIterator[str]:
+        try:
+            payload = self._build_payload(prompt, max_tokens or settings.llm_max_tokens, stream=True, model=model)
+            
+            if settings.llm_hedging_enabled:
+                chunks = self.router.astream_generate_hedged(payload)
+            else:
+                chunks = self.router.astream_generate(payload)
+            
+            async with aclosing(chunks) as chunks:
+                async for chunk in chunks:
+                    if chunk.get("error"):
+                        raise Exception(f"LLM stream error: {chunk['error']}")
+                    
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    
+                    if chunk.get("done"):
+                        break
+            
+        except httpx.TimeoutException:
+            logger.error("Ollama stream timed out")
+            raise Exception("LLM request timed out")
+        except httpx.HTTPError as e:
+            logger.error(f"Ollama stream failed: {e}")
+            raise Exception(f"Failed to connect to LLM: {e}")
+    
     def _calculate_confidence(self, kb_documents: List[KBDocument], response_text: str) -> float:
         if not kb_documents:
             return 0.5
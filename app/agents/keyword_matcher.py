@@ -0,0 +1,100 @@
+from collections import deque
+from typing import List, Dict, Optional, Tuple
+from pathlib import Path
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORDS_PATH = Path(__file__).with_name("intent_keywords.json")
+
+PHRASE_SEPARATOR = "\x00"
+
+
+def load_keyword_tables(path: Optional[str] = None) -> Dict[str, Dict[str, List[str]]]:
+    keywords_path = Path(path) if path else DEFAULT_KEYWORDS_PATH
+    
+    with open(keywords_path, encoding="utf-8") as f:
+        tables = json.load(f)
+    
+    logger.info(f"Loaded keyword tables from {keywords_path}: {', '.join(tables)}")
+    return tables
+
+
+class KeywordMatcher:
+    
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        self.tables = tables
+        self.label_sizes: Dict[Tuple[str, str], int] = {}
+        
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._keyword_labels: List[List[Tuple[str, str]]] = []
+        
+        keyword_ids: Dict[str, int] = {}
+        for group, labels in tables.items():
+            for label, keywords in labels.items():
+                self.label_sizes[(group, label)] = len(keywords)
+                for keyword in keywords:
+                    keyword = keyword.lower()
+                    if keyword not in keyword_ids:
+                        keyword_ids[keyword] = len(self._keyword_labels)
+                        self._keyword_labels.append([])
+                        self._add_pattern(keyword, keyword_ids[keyword])
+                    self._keyword_labels[keyword_ids[keyword]].append((group, label))
+        
+        self._build_failure_links()
+        
+        logger.info(f"Compiled keyword automaton: {len(keyword_ids)} keywords, {len(self._goto)} states")
+    
+    def match(self, phrases: List[str]) -> Dict[str, Dict[str, int]]:
+        text = PHRASE_SEPARATOR.join(phrase.lower() for phrase in phrases)
+        
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._output[state])
+        
+        counts: Dict[Tuple[str, str], int] = {}
+        for keyword_id in found:
+            for group_label in self._keyword_labels[keyword_id]:
+                counts[group_label] = counts.get(group_label, 0) + 1
+        
+        scores = {}
+        for group, labels in self.tables.items():
+            scores[group] = {
+                label: counts[(group, label)]
+                for label in labels
+                if counts.get((group, label))
+            }
+        
+        return scores
+    
+    def _add_pattern(self, keyword: str, keyword_id: int):
+        state = 0
+        for char in keyword:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append(keyword_id)
+    
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
@@ -0,0 +1,150 @@
+from app.agents.azure_nlp_agent import AzureNLPAgent
+from app.embeddings.embed import EmbeddingGenerator
+from app.schemas.ticket import TicketIntentClassification
+from typing import List, Dict, Optional, Tuple
+from pathlib import Path
+import numpy as np
+import asyncio
+import threading
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXAMPLES_PATH = Path(__file__).with_name("intent_examples.json")
+
+
+def load_intent_examples(path: Optional[str] = None) -> Dict[str, List[str]]:
+    examples_path = Path(path) if path else DEFAULT_EXAMPLES_PATH
+    
+    with open(examples_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class LocalIntentClassifier:
+    
+    def __init__(self, embedding_generator: EmbeddingGenerator, examples: Dict[str, List[str]]):
+        self.embedding_generator = embedding_generator
+        self.labels = list(examples)
+        
+        texts = [text for label in self.labels for text in examples[label]]
+        embeddings = self._normalize(embedding_generator.embed_batch(texts))
+        
+        centroids = []
+        offset = 0
+        for label in self.labels:
+            count = len(examples[label])
+            centroids.append(embeddings[offset:offset + count].mean(axis=0))
+            offset += count
+        
+        self.centroids = self._normalize(np.vstack(centroids))
+        
+        logger.info(f"Local intent classifier ready: {len(self.labels)} intents from {len(texts)} examples")
+    
+    def predict(self, text: str) -> Tuple[str, float, float]:
+        return self.predict_batch([text])[0]
+    
+    def predict_batch(self, texts: List[str]) -> List[Tuple[str, float, float]]:
+        queries = self._normalize(self.embedding_generator.embed_batch(texts))
+        
+        scores = queries @ self.centroids.T
+        ranked = np.argsort(-scores, axis=1)
+        
+        predictions = []
+        for row, order in zip(scores, ranked):
+            best = row[order[0]]
+            runner_up = row[order[1]] if len(order) > 1 else 0.0
+            predictions.append((self.labels[order[0]], float(best), float(best - runner_up)))
+        
+        return predictions
+    
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class TieredIntentClassifier:
+    
+    def __init__(
+        self,
+        azure_nlp: AzureNLPAgent,
+        local: Optional[LocalIntentClassifier] = None,
+        mode: str = "off",
+        margin_threshold: float = 0.08
+    ):
+        self.azure_nlp = azure_nlp
+        self.local = local
+        self.mode = mode if local else "off"
+        self.margin_threshold = margin_threshold
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_decisions": 0,
+            "azure_decisions": 0,
+            "comparisons": 0,
+            "agreements": 0
+        }
+    
+    def analyze(self, title: str, description: str) -> Tuple[TicketIntentClassification, str]:
+        if self.mode == "off":
+            return self.azure_nlp.analyze_ticket(title=title, description=description), "azure_nlp_agent"
+        
+        text = f"{title}. {description}"
+        local_intent, score, margin = self.local.predict(text)
+        
+        if self.mode == "tiered" and margin >= self.margin_threshold:
+            self._increment("local_decisions")
+            logger.info(f"Local intent classifier accepted: intent={local_intent}, margin={margin:.3f}")
+            result = self.azure_nlp.classify_with_intent(title, description, local_intent, self._confidence(score))
+            return result, "local_intent_classifier"
+        
+        result = self.azure_nlp.analyze_ticket(title=title, description=description)
+        self._increment("azure_decisions")
+        self._record_comparison(local_intent, result.intent)
+        
+        return result, "azure_nlp_agent"
+    
+    async def aanalyze(self, title: str, description: str) -> Tuple[TicketIntentClassification, str]:
+        if self.mode == "off":
+            return await self.azure_nlp.aanalyze_ticket(title=title, description=description), "azure_nlp_agent"
+        
+        text = f"{title}. {description}"
+        local_intent, score, margin = await asyncio.to_thread(self.local.predict, text)
+        
+        if self.mode == "tiered" and margin >= self.margin_threshold:
+            self._increment("local_decisions")
+            logger.info(f"Local intent classifier accepted: intent={local_intent}, margin={margin:.3f}")
+            result = await self.azure_nlp.aclassify_with_intent(title, description, local_intent, self._confidence(score))
+            return result, "local_intent_classifier"
+        
+        result = await self.azure_nlp.aanalyze_ticket(title=title, description=description)
+        self._increment("azure_decisions")
+        self._record_comparison(local_intent, result.intent)
+        
+        return result, "azure_nlp_agent"
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        decisions = stats["local_decisions"] + stats["azure_decisions"]
+        stats["mode"] = self.mode
+        stats["margin_threshold"] = self.margin_threshold
+        stats["local_rate"] = round(stats["local_decisions"] / decisions, 4) if decisions else 0.0
+        stats["agreement_rate"] = round(stats["agreements"] / stats["comparisons"], 4) if stats["comparisons"] else None
+        
+        return stats
+    
+    @staticmethod
+    def _confidence(score: float) -> float:
+        return round(min(max(score, 0.0), 0.95), 2)
+    
+    def _record_comparison(self, local_intent: str, azure_intent: str):
+        with self._lock:
+            self._stats["comparisons"] += 1
+            if local_intent == azure_intent:
+                self._stats["agreements"] += 1
+    
+    def _increment(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
@@ -1,7 +1,9 @@
 from app.embeddings.embed import EmbeddingGenerator
-from app.embeddings.pinecone_client import PineconeClient
+from app.embeddings.vector_store import create_vector_store, create_document_store
 from app.schemas.response import KBDocument
-from typing import List, Optional
+from typing import List, Optional, Callable
+import numpy as np
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,51 +13,153 @@ class RetrievalAgent:
     
     def __init__(self):
         self.embedding_generator = EmbeddingGenerator()
-        self.pinecone_client = PineconeClient()
-        self.pinecone_client.initialize_index(dimension=self.embedding_generator.get_dimension())
+        self.doc_store = create_document_store()
+        self.vector_store = create_vector_store(doc_store=self.doc_store)
+        self.vector_store.initialize_index(dimension=self.embedding_generator.get_dimension())
+        self.reindex_listeners: List[Callable[[List[str]], None]] = []
     
     def retrieve_relevant_documents(
         self,
         query_text: str,
         intent: Optional[str] = None,
         top_k: int = 5,
-        min_similarity: float = 0.7
+        min_similarity: float = 0.7,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[KBDocument]:
+        results = self.query_candidates(
+            query_text=query_text,
+            intent=intent,
+            top_k=top_k,
+            query_embedding=query_embedding
+        )
+        
+        return self.select_documents(
+            results=results,
+            intent=intent,
+            top_k=top_k,
+            min_similarity=min_similarity
+        )
+    
+    def query_candidates(
+        self,
+        query_text: str,
+        intent: Optional[str] = None,
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[dict]:
         logger.info(f"Retrieving documents for query: {query_text[:50]}...")
         
-        query_embedding = self.embedding_generator.generate_embedding(query_text)
+        if query_embedding is None:
+            query_embedding = self.embed_query(query_text)
         
         filter_dict = None
         if intent:
             filter_dict = {"category": {"$eq": intent}}
         
-        results = self.pinecone_client.query(
+        return self.vector_store.query(
             query_embedding=query_embedding,
             top_k=top_k,
             filter=filter_dict
         )
+    
+    def embed_query(self, query_text: str) -> np.ndarray:
+        return self.embedding_generator.embed(query_text)
+    
+    async def aembed_query(self, query_text: str) -> np.ndarray:
+        return await self.embedding_generator.aembed(query_text)
+    
+    def select_documents(
+        self,
+        results: List[dict],
+        intent: Optional[str] = None,
+        top_k: int = 5,
+        min_similarity: float = 0.7
+    ) -> List[KBDocument]:
+        if intent:
+            results = [result for result in results if result.get("category") == intent]
+        
+        survivors = [result for result in results[:top_k] if result["score"] >= min_similarity]
+        
+        texts = {}
+        missing = [result["id"] for result in survivors if result.get("text") is None]
+        if missing and self.doc_store:
+            texts = self.doc_store.get_many(missing)
         
         kb_documents = []
-        for result in results:
-            if result["score"] >= min_similarity:
-                kb_documents.append(KBDocument(
-                    doc_id=result["id"],
-                    content=result["text"],
-                    similarity_score=result["score"],
-                    metadata={
-                        "source": result.get("source", "unknown"),
-                        "category": result.get("category", "general")
-                    }
-                ))
+        for result in survivors:
+            content = result["text"] if result.get("text") is not None else texts.get(result["id"])
+            if content is None:
+                logger.warning(f"No content found for document {result['id']}, skipping")
+                continue
+            
+            kb_documents.append(KBDocument(
+                doc_id=result["id"],
+                content=content,
+                similarity_score=result["score"],
+                metadata={
+                    "source": result.get("source", "unknown"),
+                    "category": result.get("category", "general")
+                }
+            ))
         
         logger.info(f"Retrieved {len(kb_documents)} documents above similarity threshold {min_similarity}")
         return kb_documents
     
+    async def aretrieve_relevant_documents(
+        self,
+        query_text: str,
+        intent: Optional[str] = None,
+        top_k: int = 5,
+        min_similarity: float = 0.7,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[KBDocument]:
+        return await asyncio.to_thread(
+            self.retrieve_relevant_documents,
+            query_text=query_text,
+            intent=intent,
+            top_k=top_k,
+            min_similarity=min_similarity,
+            query_embedding=query_embedding
+        )
+    
+    async def aselect_documents(
+        self,
+        results: List[dict],
+        intent: Optional[str] = None,
+        top_k: int = 5,
+        min_similarity: float = 0.7
+    ) -> List[KBDocument]:
+        if not self.doc_store:
+            return self.select_documents(results, intent=intent, top_k=top_k, min_similarity=min_similarity)
+        
+        return await asyncio.to_thread(
+            self.select_documents,
+            results=results,
+            intent=intent,
+            top_k=top_k,
+            min_similarity=min_similarity
+        )
+    
+    async def aquery_candidates(
+        self,
+        query_text: str,
+        intent: Optional[str] = None,
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[dict]:
+        return await asyncio.to_thread(
+            self.query_candidates,
+            query_text=query_text,
+            intent=intent,
+            top_k=top_k,
+            query_embedding=query_embedding
+        )
+    
     def index_knowledge_base(self, documents: List[dict]):
         logger.info(f"Indexing {len(documents)} documents to knowledge base")
         
         texts = [doc["text"] for doc in documents]
-        embeddings = self.embedding_generator.generate_embeddings_batch(texts)
+        embeddings = self.embedding_generator.embed_batch(texts, show_progress_bar=True)
         
         indexed_docs = []
         for i, doc in enumerate(documents):
@@ -67,5 +171,10 @@ class RetrievalAgent:
                 "category": doc.get("category", "general")
             })
         
-        self.pinecone_client.upsert_documents(indexed_docs)
+        self.vector_store.upsert_documents(indexed_docs)
+        
+        doc_ids = [doc["id"] for doc in indexed_docs]
+        for listener in self.reindex_listeners:
+            listener(doc_ids)
+        
         logger.info("Knowledge base indexing complete")
@@ -1,14 +1,34 @@
-from typing import TypedDict, List, Annotated
-from langgraph.graph import StateGraph, END
+from typing import TypedDict, List, Annotated, AsyncIterator, Tuple, Any, Optional
+from langgraph.graph import StateGraph, START, END
 from app.agents.azure_nlp_agent import AzureNLPAgent
 from app.agents.retrieval_agent import RetrievalAgent
 from app.agents.drafting_agent import DraftingAgent
+from app.agents.context_packer import ContextPacker
+from app.agents.local_intent_classifier import (
+    LocalIntentClassifier,
+    TieredIntentClassifier,
+    load_intent_examples
+)
+from app.cache.response_cache import SemanticResponseCache
+from app.llm.admission import AdmissionRejected
+from app.config import settings
 from app.schemas.response import KBDocument, AgentDecision, DraftedResponse
 from datetime import datetime
+import numpy as np
+import asyncio
+import operator
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+RETRIEVAL_TOP_K = 5
+RETRIEVAL_MIN_SIMILARITY = 0.65
+
+
+def merge_errors(current: str, new: str) -> str:
+    return "; ".join(error for error in (current, new) if error)
+
 
 class TicketState(TypedDict):
     ticket_id: str
@@ -21,14 +41,16 @@ class TicketState(TypedDict):
     sentiment: str
     priority: str
     
+    query_embedding: Optional[np.ndarray]
+    kb_candidates: List[dict]
     kb_documents: List[KBDocument]
     
     drafted_response: str
     final_confidence: float
     
-    agent_decisions: List[AgentDecision]
+    agent_decisions: Annotated[List[AgentDecision], operator.add]
     requires_human_review: bool
-    error: str
+    error: Annotated[str, merge_errors]
 
 
 class SupervisorAgent:
@@ -36,111 +58,270 @@ class SupervisorAgent:
     def __init__(self):
         self.azure_nlp = AzureNLPAgent()
         self.retrieval = RetrievalAgent()
-        self.drafting = DraftingAgent()
+        self.drafting = DraftingAgent(context_packer=self._build_context_packer())
+        self.intent_classifier = self._build_intent_classifier()
+        self.parallel_retrieval = settings.supervisor_parallel_retrieval
+        
+        self.response_cache: Optional[SemanticResponseCache] = None
+        if settings.response_cache_enabled:
+            self.response_cache = SemanticResponseCache(
+                max_distance=settings.response_cache_max_distance,
+                ttl_seconds=settings.response_cache_ttl_seconds,
+                max_entries=settings.response_cache_max_entries
+            )
+            self.retrieval.reindex_listeners.append(self.response_cache.invalidate_documents)
+        
         self.graph = self._build_graph()
+        
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_loop_lock = threading.Lock()
+    
+    def _build_intent_classifier(self) -> TieredIntentClassifier:
+        local = None
+        if settings.local_intent_mode != "off":
+            local = LocalIntentClassifier(
+                embedding_generator=self.retrieval.embedding_generator,
+                examples=load_intent_examples(settings.local_intent_examples_path)
+            )
+        
+        return TieredIntentClassifier(
+            azure_nlp=self.azure_nlp,
+            local=local,
+            mode=settings.local_intent_mode,
+            margin_threshold=settings.local_intent_margin_threshold
+        )
+    
+    def _build_context_packer(self) -> Optional[ContextPacker]:
+        if not settings.kb_context_packing_enabled:
+            return None
+        
+        return ContextPacker(
+            embedding_generator=self.retrieval.embedding_generator,
+            token_budget=settings.get_kb_context_budget()
+        )
     
     def _build_graph(self) -> StateGraph:
         workflow = StateGraph(TicketState)
         
         workflow.add_node("analyze_ticket", self._analyze_ticket_node)
-        workflow.add_node("retrieve_documents", self._retrieve_documents_node)
         workflow.add_node("draft_response", self._draft_response_node)
         workflow.add_node("evaluate_quality", self._evaluate_quality_node)
         
-        workflow.set_entry_point("analyze_ticket")
+        if self.parallel_retrieval:
+            workflow.add_node("retrieve_candidates", self._retrieve_candidates_node)
+            workflow.add_node("filter_documents", self._filter_documents_node)
+            
+            workflow.add_edge(START, "analyze_ticket")
+            workflow.add_edge(START, "retrieve_candidates")
+            
+            workflow.add_edge(["analyze_ticket", "retrieve_candidates"], "filter_documents")
+            workflow.add_edge("filter_documents", "draft_response")
+        else:
+            workflow.add_node("retrieve_documents", self._retrieve_documents_node)
+            
+            workflow.set_entry_point("analyze_ticket")
+            
+            workflow.add_edge("analyze_ticket", "retrieve_documents")
+            workflow.add_edge("retrieve_documents", "draft_response")
         
-        workflow.add_edge("analyze_ticket", "retrieve_documents")
-        workflow.add_edge("retrieve_documents", "draft_response")
         workflow.add_edge("draft_response", "evaluate_quality")
         workflow.add_edge("evaluate_quality", END)
         
         return workflow.compile()
     
-    def _analyze_ticket_node(self, state: TicketState) -> TicketState:
+    async def _analyze_ticket_node(self, state: TicketState) -> dict:
         logger.info(f"[Supervisor] Analyzing ticket {state['ticket_id']}")
         
         try:
-            result = self.azure_nlp.analyze_ticket(
+            result, source = await self.intent_classifier.aanalyze(
                 title=state["title"],
                 description=state["description"]
             )
             
-            state["intent"] = result.intent
-            state["confidence"] = result.confidence
-            state["entities"] = result.entities
-            state["sentiment"] = result.sentiment
-            state["priority"] = result.priority.value
-            
-            state["agent_decisions"].append(AgentDecision(
-                agent_name="azure_nlp_agent",
-                action="analyze_intent_and_entities",
-                output={
-                    "intent": result.intent,
-                    "confidence": result.confidence,
-                    "sentiment": result.sentiment,
-                    "priority": result.priority.value
-                },
-                confidence=result.confidence,
-                timestamp=datetime.utcnow()
-            ))
-            
             logger.info(f"[Supervisor] Analysis complete: intent={result.intent}, priority={result.priority.value}")
             
+            return {
+                "intent": result.intent,
+                "confidence": result.confidence,
+                "entities": result.entities,
+                "sentiment": result.sentiment,
+                "priority": result.priority.value,
+                "agent_decisions": [AgentDecision(
+                    agent_name=source,
+                    action="analyze_intent_and_entities",
+                    output={
+                        "intent": result.intent,
+                        "confidence": result.confidence,
+                        "sentiment": result.sentiment,
+                        "priority": result.priority.value
+                    },
+                    confidence=result.confidence,
+                    timestamp=datetime.utcnow()
+                )]
+            }
+            
         except Exception as e:
             logger.error(f"[Supervisor] Analysis failed: {e}")
-            state["error"] = f"NLP analysis failed: {str(e)}"
-        
-        return state
+            return {"error": f"NLP analysis failed: {str(e)}"}
     
-    def _retrieve_documents_node(self, state: TicketState) -> TicketState:
+    async def _retrieve_documents_node(self, state: TicketState) -> dict:
         logger.info(f"[Supervisor] Retrieving relevant documents for {state['ticket_id']}")
         
         try:
             query_text = f"{state['title']}. {state['description']}"
+            query_embedding = await self.retrieval.aembed_query(query_text)
             
-            kb_docs = self.retrieval.retrieve_relevant_documents(
+            kb_docs = await self.retrieval.aretrieve_relevant_documents(
                 query_text=query_text,
                 intent=state.get("intent"),
-                top_k=5,
-                min_similarity=0.65
+                top_k=RETRIEVAL_TOP_K,
+                min_similarity=RETRIEVAL_MIN_SIMILARITY,
+                query_embedding=query_embedding
             )
             
-            state["kb_documents"] = kb_docs
+            logger.info(f"[Supervisor] Retrieved {len(kb_docs)} relevant documents")
             
-            state["agent_decisions"].append(AgentDecision(
-                agent_name="retrieval_agent",
-                action="retrieve_kb_documents",
-                output={
-                    "num_documents": len(kb_docs),
-                    "avg_similarity": sum(d.similarity_score for d in kb_docs) / len(kb_docs) if kb_docs else 0
-                },
-                timestamp=datetime.utcnow()
-            ))
+            return {
+                "query_embedding": query_embedding,
+                "kb_documents": kb_docs,
+                "agent_decisions": [self._retrieval_decision(kb_docs)]
+            }
             
-            logger.info(f"[Supervisor] Retrieved {len(kb_docs)} relevant documents")
+        except Exception as e:
+            logger.error(f"[Supervisor] Retrieval failed: {e}")
+            return {
+                "error": f"Document retrieval failed: {str(e)}",
+                "kb_documents": []
+            }
+    
+    async def _retrieve_candidates_node(self, state: TicketState) -> dict:
+        logger.info(f"[Supervisor] Retrieving candidate documents for {state['ticket_id']}")
+        
+        try:
+            query_text = f"{state['title']}. {state['description']}"
+            query_embedding = await self.retrieval.aembed_query(query_text)
+            
+            candidates = await self.retrieval.aquery_candidates(
+                query_text=query_text,
+                top_k=RETRIEVAL_TOP_K * settings.retrieval_overfetch_factor,
+                query_embedding=query_embedding
+            )
+            
+            return {
+                "query_embedding": query_embedding,
+                "kb_candidates": candidates
+            }
             
         except Exception as e:
             logger.error(f"[Supervisor] Retrieval failed: {e}")
-            state["error"] = f"Document retrieval failed: {str(e)}"
-            state["kb_documents"] = []
+            return {"error": f"Document retrieval failed: {str(e)}"}
+    
+    async def _filter_documents_node(self, state: TicketState) -> dict:
+        kb_docs = await self.retrieval.aselect_documents(
+            results=state["kb_candidates"],
+            intent=state.get("intent"),
+            top_k=RETRIEVAL_TOP_K,
+            min_similarity=RETRIEVAL_MIN_SIMILARITY
+        )
+        
+        logger.info(
+            f"[Supervisor] Retrieved {len(kb_docs)} relevant documents "
+            f"from {len(state['kb_candidates'])} candidates"
+        )
         
-        return state
+        return {
+            "kb_documents": kb_docs,
+            "agent_decisions": [self._retrieval_decision(kb_docs)]
+        }
     
-    def _draft_response_node(self, state: TicketState) -> TicketState:
+    def _retrieval_decision(self, kb_docs: List[KBDocument]) -> AgentDecision:
+        return AgentDecision(
+            agent_name="retrieval_agent",
+            action="retrieve_kb_documents",
+            output={
+                "num_documents": len(kb_docs),
+                "avg_similarity": sum(d.similarity_score for d in kb_docs) / len(kb_docs) if kb_docs else 0
+            },
+            timestamp=datetime.utcnow()
+        )
+    
+    async def _draft_response_node(self, state: TicketState) -> dict:
         logger.info(f"[Supervisor] Drafting response for {state['ticket_id']}")
         
+        cached = self._lookup_cached_response(state)
+        if cached:
+            return cached
+        
         try:
-            response_text, confidence = self.drafting.draft_response(
+            response_text, confidence = await self.drafting.adraft_response(
                 ticket_title=state["title"],
                 ticket_description=state["description"],
                 intent=state["intent"],
-                kb_documents=state["kb_documents"]
+                kb_documents=state["kb_documents"],
+                priority=state["priority"] or "medium",
+                query_embedding=state.get("query_embedding")
             )
             
-            state["drafted_response"] = response_text
-            state["final_confidence"] = confidence
+            self._store_cached_response(state, response_text, confidence)
             
-            state["agent_decisions"].append(AgentDecision(
+            return self._drafting_update(response_text, confidence)
+            
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.error(f"[Supervisor] Drafting failed: {e}")
+            return self._drafting_failure_update(e)
+    
+    def _lookup_cached_response(self, state: TicketState) -> Optional[dict]:
+        if not self.response_cache or state.get("query_embedding") is None:
+            return None
+        
+        cached = self.response_cache.lookup(state["query_embedding"], state["kb_documents"])
+        if not cached:
+            return None
+        
+        logger.info(
+            f"[Supervisor] Reusing cached response from {cached['source_ticket_id']} "
+            f"(distance={cached['distance']:.4f})"
+        )
+        
+        return {
+            "drafted_response": cached["draft_text"],
+            "final_confidence": cached["confidence"],
+            "agent_decisions": [AgentDecision(
+                agent_name="drafting_agent",
+                action="reuse_cached_response",
+                output={
+                    "response_length": len(cached["draft_text"]),
+                    "confidence": cached["confidence"],
+                    "source_ticket_id": cached["source_ticket_id"],
+                    "distance": cached["distance"],
+                    "doc_ids": [doc.doc_id for doc in state["kb_documents"]]
+                },
+                confidence=cached["confidence"],
+                timestamp=datetime.utcnow()
+            )]
+        }
+    
+    def _store_cached_response(self, state: TicketState, response_text: str, confidence: float):
+        if not self.response_cache or state.get("query_embedding") is None or not response_text:
+            return
+        
+        self.response_cache.store(
+            query_embedding=state["query_embedding"],
+            kb_documents=state["kb_documents"],
+            draft_text=response_text,
+            confidence=confidence,
+            ticket_id=state["ticket_id"]
+        )
+    
+    def _drafting_update(self, response_text: str, confidence: float) -> dict:
+        logger.info(f"[Supervisor] Response drafted with {confidence:.2f} confidence")
+        
+        return {
+            "drafted_response": response_text,
+            "final_confidence": confidence,
+            "agent_decisions": [AgentDecision(
                 agent_name="drafting_agent",
                 action="generate_response",
                 output={
@@ -149,19 +330,17 @@ class SupervisorAgent:
                 },
                 confidence=confidence,
                 timestamp=datetime.utcnow()
-            ))
-            
-            logger.info(f"[Supervisor] Response drafted with {confidence:.2f} confidence")
-            
-        except Exception as e:
-            logger.error(f"[Supervisor] Drafting failed: {e}")
-            state["error"] = f"Response drafting failed: {str(e)}"
-            state["drafted_response"] = "Unable to generate response at this time."
-            state["final_confidence"] = 0.0
-        
-        return state
+            )]
+        }
     
-    def _evaluate_quality_node(self, state: TicketState) -> TicketState:
+    def _drafting_failure_update(self, error: Exception) -> dict:
+        return {
+            "error": f"Response drafting failed: {str(error)}",
+            "drafted_response": "Unable to generate response at this time.",
+            "final_confidence": 0.0
+        }
+    
+    def _evaluate_quality_node(self, state: TicketState) -> dict:
         logger.info(f"[Supervisor] Evaluating response quality for {state['ticket_id']}")
         
         confidence_threshold = 0.7
@@ -174,21 +353,20 @@ class SupervisorAgent:
             "error" in state
         )
         
-        state["requires_human_review"] = needs_review
-        
-        state["agent_decisions"].append(AgentDecision(
-            agent_name="supervisor",
-            action="evaluate_quality",
-            output={
-                "requires_review": needs_review,
-                "reason": self._get_review_reason(state, confidence_threshold, min_kb_docs)
-            },
-            timestamp=datetime.utcnow()
-        ))
-        
         logger.info(f"[Supervisor] Quality evaluation complete. Human review: {needs_review}")
         
-        return state
+        return {
+            "requires_human_review": needs_review,
+            "agent_decisions": [AgentDecision(
+                agent_name="supervisor",
+                action="evaluate_quality",
+                output={
+                    "requires_review": needs_review,
+                    "reason": self._get_review_reason(state, confidence_threshold, min_kb_docs)
+                },
+                timestamp=datetime.utcnow()
+            )]
+        }
     
     def _get_review_reason(self, state: TicketState, conf_threshold: float, min_docs: int) -> str:
         reasons = []
@@ -207,15 +385,143 @@ class SupervisorAgent:
         
         return ", ".join(reasons) if reasons else "passed all checks"
     
+    def check_admission(self):
+        self.drafting.admission.check("urgent")
+    
+    def get_stats(self) -> dict:
+        return {
+            "azure_nlp": self.azure_nlp.get_stats(),
+            "intent_classifier": self.intent_classifier.get_stats(),
+            "embeddings": self.retrieval.embedding_generator.get_stats(),
+            "kb_doc_store": self.retrieval.doc_store.get_stats() if self.retrieval.doc_store else None,
+            "drafting": self.drafting.get_stats(),
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None
+        }
+    
+    async def aclose(self):
+        await self.azure_nlp.aclose()
+        await self.drafting.aclose()
+    
     def process_ticket(
         self,
         ticket_id: str,
         title: str,
         description: str
+    ) -> DraftedResponse:
+        return asyncio.run_coroutine_threadsafe(self.aprocess_ticket(
+            ticket_id=ticket_id,
+            title=title,
+            description=description
+        ), self._ensure_sync_loop()).result()
+    
+    def _ensure_sync_loop(self) -> asyncio.AbstractEventLoop:
+        with self._sync_loop_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._sync_loop.run_forever, name="supervisor-sync-loop", daemon=True).start()
+        return self._sync_loop
+    
+    async def aprocess_ticket(
+        self,
+        ticket_id: str,
+        title: str,
+        description: str
     ) -> DraftedResponse:
         logger.info(f"[Supervisor] Starting ticket processing: {ticket_id}")
         
-        initial_state = TicketState(
+        initial_state = self._initial_state(ticket_id, title, description)
+        
+        final_state = await self.graph.ainvoke(initial_state)
+        
+        result = self._build_result(final_state)
+        
+        logger.info(f"[Supervisor] Ticket processing complete: {ticket_id}")
+        
+        return result
+    
+    async def astream_ticket(
+        self,
+        ticket_id: str,
+        title: str,
+        description: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        logger.info(f"[Supervisor] Starting streamed ticket processing: {ticket_id}")
+        
+        state = self._initial_state(ticket_id, title, description)
+        
+        if self.parallel_retrieval:
+            analysis, candidates = await asyncio.gather(
+                self._analyze_ticket_node(state),
+                self._retrieve_candidates_node(state)
+            )
+            self._apply_update(state, analysis)
+            self._apply_update(state, candidates)
+            retrieval = await self._filter_documents_node(state)
+        else:
+            analysis = await self._analyze_ticket_node(state)
+            self._apply_update(state, analysis)
+            retrieval = await self._retrieve_documents_node(state)
+        
+        yield "analysis", {
+            "intent": state["intent"],
+            "confidence": state["confidence"],
+            "sentiment": state["sentiment"],
+            "priority": state["priority"]
+        }
+        
+        self._apply_update(state, retrieval)
+        
+        yield "retrieval", {
+            "num_documents": len(state["kb_documents"]),
+            "doc_ids": [doc.doc_id for doc in state["kb_documents"]]
+        }
+        
+        logger.info(f"[Supervisor] Streaming response draft for {ticket_id}")
+        
+        cached = self._lookup_cached_response(state)
+        if cached:
+            yield "token", {"text": cached["drafted_response"]}
+            
+            self._apply_update(state, cached)
+            self._apply_update(state, self._evaluate_quality_node(state))
+            
+            yield "complete", self._build_result(state)
+            return
+        
+        tokens = []
+        try:
+            async for token in self.drafting.astream_response(
+                ticket_title=state["title"],
+                ticket_description=state["description"],
+                intent=state["intent"],
+                kb_documents=state["kb_documents"],
+                priority=state["priority"] or "medium",
+                query_embedding=state.get("query_embedding")
+            ):
+                tokens.append(token)
+                yield "token", {"text": token}
+            
+            response_text = "".join(tokens).strip()
+            confidence = self.drafting._calculate_confidence(state["kb_documents"], response_text)
+            
+            self._store_cached_response(state, response_text, confidence)
+            drafting = self._drafting_update(response_text, confidence)
+            
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.error(f"[Supervisor] Drafting failed: {e}")
+            drafting = self._drafting_failure_update(e)
+        
+        self._apply_update(state, drafting)
+        self._apply_update(state, self._evaluate_quality_node(state))
+        
+        logger.info(f"[Supervisor] Streamed ticket processing complete: {ticket_id}")
+        
+        yield "complete", self._build_result(state)
+    
+    def _initial_state(self, ticket_id: str, title: str, description: str) -> TicketState:
+        return TicketState(
             ticket_id=ticket_id,
             title=title,
             description=description,
@@ -224,6 +530,8 @@ class SupervisorAgent:
             entities=[],
             sentiment="",
             priority="",
+            query_embedding=None,
+            kb_candidates=[],
             kb_documents=[],
             drafted_response="",
             final_confidence=0.0,
@@ -231,11 +539,19 @@ class SupervisorAgent:
             requires_human_review=False,
             error=""
         )
-        
-        final_state = self.graph.invoke(initial_state)
-        
-        result = DraftedResponse(
-            ticket_id=ticket_id,
+    
+    def _apply_update(self, state: TicketState, update: dict):
+        for key, value in update.items():
+            if key == "agent_decisions":
+                state[key] = state[key] + value
+            elif key == "error":
+                state[key] = merge_errors(state[key], value)
+            else:
+                state[key] = value
+    
+    def _build_result(self, final_state: TicketState) -> DraftedResponse:
+        return DraftedResponse(
+            ticket_id=final_state["ticket_id"],
             draft_text=final_state["drafted_response"],
             confidence=final_state["final_confidence"],
             kb_documents=final_state["kb_documents"],
@@ -243,7 +559,3 @@ class SupervisorAgent:
             requires_human_review=final_state["requires_human_review"],
             created_at=datetime.utcnow()
         )
-        
-        logger.info(f"[Supervisor] Ticket processing complete: {ticket_id}")
-        
-        return result
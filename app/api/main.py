@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import tickets, health
+from app.api.routes import tickets, health, metrics
 from app.config import settings
+from app.db.session import async_engine
 import logging
 
 logging.basicConfig(
@@ -27,18 +28,22 @@ app.add_middleware(
 
 app.include_router(health.router, tags=["Health"])
 app.include_router(tickets.router, prefix="/api/v1", tags=["Tickets"])
+app.include_router(metrics.router, prefix="/api/v1", tags=["Metrics"])
 
 
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Starting {settings.project_name} in {settings.env} environment")
     logger.info(f"Azure endpoint: {settings.azure_text_analytics_endpoint}")
-    logger.info(f"Ollama URL: {settings.ollama_base_url}")
+    logger.info(f"Ollama URLs: {', '.join(settings.get_ollama_backend_urls())}")
+    tickets.supervisor.drafting.start_background_tasks()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application")
+    await tickets.supervisor.aclose()
+    await async_engine.dispose()
 
 
 if __name__ == "__main__":
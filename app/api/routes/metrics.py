@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from app.api.routes.tickets import supervisor
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return supervisor.get_stats()
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db, AsyncSessionLocal
 from app.db.models import Ticket, AgentDecisionLog, DraftedResponseLog
 from app.schemas.ticket import TicketCreate, TicketResponse
-from app.schemas.response import TicketResolutionResponse, KBDocument
+from app.schemas.response import TicketResolutionResponse, KBDocument, DraftedResponse
 from app.agents.supervisor import SupervisorAgent
-from typing import List
+from app.llm.admission import AdmissionRejected
+from typing import List, AsyncIterator
 import logging
+import json
+import math
 import time
 
 logger = logging.getLogger(__name__)
@@ -17,11 +22,17 @@ supervisor = SupervisorAgent()
 
 
 @router.post("/tickets", response_model=TicketResolutionResponse, status_code=status.HTTP_201_CREATED)
-async def submit_ticket(ticket_data: TicketCreate, db: Session = Depends(get_db)):
+async def submit_ticket(ticket_data: TicketCreate, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Received ticket submission from {ticket_data.user_email}")
     
     start_time = time.time()
     
+    try:
+        supervisor.check_admission()
+    except AdmissionRejected as e:
+        logger.warning(f"Ticket from {ticket_data.user_email} rejected by LLM admission control: {e}")
+        raise _too_many_requests(e)
+    
     try:
         ticket = Ticket(
             title=ticket_data.title,
@@ -31,42 +42,18 @@ async def submit_ticket(ticket_data: TicketCreate, db: Session = Depends(get_db)
         )
         
         db.add(ticket)
-        db.commit()
-        db.refresh(ticket)
+        await db.commit()
+        await db.refresh(ticket)
         
         logger.info(f"Created ticket: {ticket.id}")
         
-        result = supervisor.process_ticket(
+        result = await supervisor.aprocess_ticket(
             ticket_id=ticket.id,
             title=ticket.title,
             description=ticket.description
         )
         
-        ticket.status = "in_progress"
-        ticket.intent = result.agent_decisions[0].output.get("intent") if result.agent_decisions else None
-        ticket.priority = result.agent_decisions[0].output.get("priority") if result.agent_decisions else "medium"
-        ticket.sentiment = result.agent_decisions[0].output.get("sentiment") if result.agent_decisions else None
-        
-        for decision in result.agent_decisions:
-            agent_log = AgentDecisionLog(
-                ticket_id=ticket.id,
-                agent_name=decision.agent_name,
-                action=decision.action,
-                output_data=decision.output,
-                confidence=decision.confidence
-            )
-            db.add(agent_log)
-        
-        response_log = DraftedResponseLog(
-            ticket_id=ticket.id,
-            draft_text=result.draft_text,
-            confidence=result.confidence,
-            kb_documents=[doc.dict() for doc in result.kb_documents],
-            requires_human_review=result.requires_human_review
-        )
-        db.add(response_log)
-        
-        db.commit()
+        await _persist_result(db, ticket, result)
         
         processing_time = time.time() - start_time
         
@@ -80,18 +67,154 @@ async def submit_ticket(ticket_data: TicketCreate, db: Session = Depends(get_db)
             requires_human_review=result.requires_human_review
         )
         
+    except AdmissionRejected as e:
+        logger.warning(f"Ticket {ticket.id} rejected by LLM admission control: {e}")
+        await db.rollback()
+        await db.delete(ticket)
+        await db.commit()
+        raise _too_many_requests(e)
+    except Exception as e:
+        logger.error(f"Ticket submission failed: {e}")
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process ticket: {str(e)}"
+        )
+
+
+@router.post("/tickets/stream", status_code=status.HTTP_201_CREATED)
+async def submit_ticket_stream(ticket_data: TicketCreate, db: AsyncSession = Depends(get_async_db)):
+    logger.info(f"Received streamed ticket submission from {ticket_data.user_email}")
+    
+    start_time = time.time()
+    
+    try:
+        supervisor.check_admission()
+    except AdmissionRejected as e:
+        logger.warning(f"Streamed ticket from {ticket_data.user_email} rejected by LLM admission control: {e}")
+        raise _too_many_requests(e)
+    
+    try:
+        ticket = Ticket(
+            title=ticket_data.title,
+            description=ticket_data.description,
+            user_email=ticket_data.user_email,
+            category=ticket_data.category
+        )
+        
+        db.add(ticket)
+        await db.commit()
+        await db.refresh(ticket)
+        
+        logger.info(f"Created ticket: {ticket.id}")
+        
     except Exception as e:
         logger.error(f"Ticket submission failed: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process ticket: {str(e)}"
         )
+    
+    ticket_id = ticket.id
+    title = ticket.title
+    description = ticket.description
+    
+    async def event_stream() -> AsyncIterator[str]:
+        yield _format_sse("ticket", {"ticket_id": ticket_id})
+        
+        async with AsyncSessionLocal() as stream_db:
+            try:
+                async for event, data in supervisor.astream_ticket(
+                    ticket_id=ticket_id,
+                    title=title,
+                    description=description
+                ):
+                    if event != "complete":
+                        yield _format_sse(event, data)
+                        continue
+                    
+                    stream_ticket = await stream_db.get(Ticket, ticket_id)
+                    await _persist_result(stream_db, stream_ticket, data)
+                    
+                    processing_time = time.time() - start_time
+                    
+                    yield _format_sse("done", TicketResolutionResponse(
+                        ticket_id=ticket_id,
+                        status=stream_ticket.status,
+                        drafted_response=data.draft_text,
+                        confidence_score=data.confidence,
+                        supporting_documents=data.kb_documents,
+                        processing_time_seconds=round(processing_time, 2),
+                        requires_human_review=data.requires_human_review
+                    ).model_dump(mode="json"))
+                
+            except AdmissionRejected as e:
+                logger.warning(f"Ticket {ticket_id} rejected by LLM admission control: {e}")
+                await stream_db.rollback()
+                await stream_db.execute(delete(Ticket).where(Ticket.id == ticket_id))
+                await stream_db.commit()
+                yield _format_sse("error", {
+                    "status_code": status.HTTP_429_TOO_MANY_REQUESTS,
+                    "detail": str(e),
+                    "retry_after": math.ceil(e.retry_after)
+                })
+            except Exception as e:
+                logger.error(f"Streamed ticket processing failed: {e}")
+                await stream_db.rollback()
+                yield _format_sse("error", {"detail": f"Failed to process ticket: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _persist_result(db: AsyncSession, ticket: Ticket, result: DraftedResponse):
+    ticket.status = "in_progress"
+    ticket.intent = result.agent_decisions[0].output.get("intent") if result.agent_decisions else None
+    ticket.priority = result.agent_decisions[0].output.get("priority") if result.agent_decisions else "medium"
+    ticket.sentiment = result.agent_decisions[0].output.get("sentiment") if result.agent_decisions else None
+    
+    for decision in result.agent_decisions:
+        agent_log = AgentDecisionLog(
+            ticket_id=ticket.id,
+            agent_name=decision.agent_name,
+            action=decision.action,
+            output_data=decision.output,
+            confidence=decision.confidence
+        )
+        db.add(agent_log)
+    
+    response_log = DraftedResponseLog(
+        ticket_id=ticket.id,
+        draft_text=result.draft_text,
+        confidence=result.confidence,
+        kb_documents=[doc.dict() for doc in result.kb_documents],
+        requires_human_review=result.requires_human_review
+    )
+    db.add(response_log)
+    
+    await db.commit()
+
+
+def _too_many_requests(error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.get("/tickets/{ticket_id}", response_model=TicketResponse)
-async def get_ticket(ticket_id: str, db: Session = Depends(get_db)):
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+async def get_ticket(ticket_id: str, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(Ticket).filter(Ticket.id == ticket_id))
+    ticket = result.scalars().first()
     
     if not ticket:
         raise HTTPException(
@@ -107,13 +230,14 @@ async def list_tickets(
     skip: int = 0,
     limit: int = 50,
     status_filter: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Ticket)
+    query = select(Ticket)
     
     if status_filter:
         query = query.filter(Ticket.status == status_filter)
     
-    tickets = query.order_by(Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(Ticket.created_at.desc()).offset(skip).limit(limit))
+    tickets = result.scalars().all()
     
     return tickets
@@ -0,0 +1,166 @@
+from app.cache.lru import TTLCache
+from typing import Dict, List, Optional
+import numpy as np
+import hashlib
+import threading
+import fcntl
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 20
+KEYS_FILE = "keys.bin"
+LOCK_FILE = "append.lock"
+
+
+class EmbeddingCache:
+    
+    def __init__(
+        self,
+        model_name: str,
+        dimension: int,
+        max_entries: int,
+        path: Optional[str] = None,
+        dtype: str = "float16"
+    ):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.memory = TTLCache(max_entries=max_entries)
+        
+        self.path = None
+        if path:
+            self.path = os.path.join(path, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name), self.dtype.name)
+            os.makedirs(self.path, exist_ok=True)
+        
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._keys_size = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0
+        }
+        
+        if self.path:
+            self._refresh()
+            logger.info(f"Embedding cache at {self.path} has {len(self._rows)} vectors")
+    
+    def make_key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_many([text])[0]
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.make_key(text) for text in texts]
+        found: List[Optional[np.ndarray]] = [self.memory.get(key) for key in keys]
+        
+        memory_hits = sum(1 for vector in found if vector is not None)
+        disk_hits = 0
+        
+        if self.path and memory_hits < len(keys):
+            if any(found[i] is None and key not in self._rows for i, key in enumerate(keys)):
+                self._refresh()
+            
+            vectors, rows = self._vectors, self._rows
+            for i, key in enumerate(keys):
+                row = rows.get(key)
+                if found[i] is None and row is not None:
+                    found[i] = np.asarray(vectors[row], dtype=np.float32)
+                    self.memory.set(key, found[i])
+                    disk_hits += 1
+        
+        with self._lock:
+            self._stats["memory_hits"] += memory_hits
+            self._stats["disk_hits"] += disk_hits
+            self._stats["misses"] += len(keys) - memory_hits - disk_hits
+        
+        return found
+    
+    def set(self, text: str, vector: np.ndarray, persist: bool = True):
+        self.set_many([text], np.asarray([vector]), persist=persist)
+    
+    def set_many(self, texts: List[str], vectors: np.ndarray, persist: bool = True):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [self.make_key(text) for text in texts]
+        
+        for key, vector in zip(keys, vectors):
+            self.memory.set(key, vector)
+        
+        with self._lock:
+            self._stats["writes"] += len(keys)
+        
+        if self.path and persist:
+            self._append(keys, vectors)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        stats["disk_entries"] = len(self._rows)
+        stats["dtype"] = self.dtype.name
+        return stats
+    
+    def _append(self, keys: List[bytes], vectors: np.ndarray):
+        with open(os.path.join(self.path, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                
+                unique = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self._rows and key not in unique:
+                        unique[key] = vector
+                
+                if not unique:
+                    return
+                
+                committed = self._keys_size // KEY_BYTES
+                with open(self._vectors_path(), "ab") as f:
+                    f.truncate(committed * self.dimension * self.dtype.itemsize)
+                    np.asarray(list(unique.values()), dtype=self.dtype).tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(os.path.join(self.path, KEYS_FILE), "ab") as f:
+                    f.truncate(self._keys_size)
+                    f.write(b"".join(unique.keys()))
+                
+                self._refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _refresh(self):
+        keys_path = os.path.join(self.path, KEYS_FILE)
+        if not os.path.exists(keys_path):
+            return
+        
+        with self._lock:
+            size = os.path.getsize(keys_path)
+            size -= size % KEY_BYTES
+            if size == self._keys_size:
+                return
+            
+            with open(keys_path, "rb") as f:
+                f.seek(self._keys_size)
+                data = f.read(size - self._keys_size)
+            
+            rows = dict(self._rows)
+            start = self._keys_size // KEY_BYTES
+            for offset in range(0, len(data), KEY_BYTES):
+                rows.setdefault(data[offset:offset + KEY_BYTES], start + offset // KEY_BYTES)
+            
+            count = size // KEY_BYTES
+            self._vectors = np.memmap(self._vectors_path(), dtype=self.dtype, mode="r", shape=(count, self.dimension))
+            self._rows = rows
+            self._keys_size = size
+    
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, f"vectors.{self.dtype.name}")
@@ -0,0 +1,118 @@
+from app.cache.lru import TTLCache
+from app.db.session import get_db_context
+from app.db.models import NLPAnalysisCacheEntry
+from app.schemas.ticket import TicketIntentClassification
+from datetime import datetime, timedelta
+from typing import Optional, Dict
+import asyncio
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class NLPAnalysisCache:
+    
+    def __init__(self, max_entries: int, ttl_seconds: int, persist: bool = False):
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "db_errors": 0
+        }
+    
+    @staticmethod
+    def make_key(title: str, description: str) -> str:
+        normalized = " ".join(f"{title}. {description}".lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    
+    def get(self, title: str, description: str) -> Optional[TicketIntentClassification]:
+        key = self.make_key(title, description)
+        
+        payload = self.memory.get(key)
+        if payload is not None:
+            self._increment("memory_hits")
+            return TicketIntentClassification(**payload)
+        
+        if self.persist:
+            payload, remaining_seconds = self._load_from_db(key)
+            if payload is not None:
+                self._increment("db_hits")
+                self.memory.set(key, payload, ttl_seconds=remaining_seconds)
+                return TicketIntentClassification(**payload)
+        
+        self._increment("misses")
+        return None
+    
+    def set(self, title: str, description: str, classification: TicketIntentClassification):
+        key = self.make_key(title, description)
+        payload = classification.model_dump(mode="json")
+        
+        self.memory.set(key, payload)
+        self._increment("writes")
+        
+        if self.persist:
+            self._store_in_db(key, payload)
+    
+    async def aget(self, title: str, description: str) -> Optional[TicketIntentClassification]:
+        if self.persist:
+            return await asyncio.to_thread(self.get, title, description)
+        return self.get(title, description)
+    
+    async def aset(self, title: str, description: str, classification: TicketIntentClassification):
+        if self.persist:
+            await asyncio.to_thread(self.set, title, description, classification)
+        else:
+            self.set(title, description, classification)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        stats["persist"] = self.persist
+        
+        return stats
+    
+    def _increment(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+    
+    def _load_from_db(self, key: str) -> tuple[Optional[Dict], Optional[float]]:
+        try:
+            with get_db_context() as db:
+                entry = db.get(NLPAnalysisCacheEntry, key)
+                now = datetime.utcnow()
+                
+                if entry is None or entry.expires_at <= now:
+                    return None, None
+                
+                return entry.result, (entry.expires_at - now).total_seconds()
+        
+        except Exception as e:
+            logger.warning(f"NLP cache lookup failed: {e}")
+            self._increment("db_errors")
+            return None, None
+    
+    def _store_in_db(self, key: str, payload: Dict):
+        try:
+            with get_db_context() as db:
+                now = datetime.utcnow()
+                db.merge(NLPAnalysisCacheEntry(
+                    cache_key=key,
+                    result=payload,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl_seconds)
+                ))
+        
+        except Exception as e:
+            logger.warning(f"NLP cache write failed: {e}")
+            self._increment("db_errors")
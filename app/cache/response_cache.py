@@ -0,0 +1,141 @@
+from app.schemas.response import KBDocument
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, Iterable
+import numpy as np
+import hashlib
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    
+    def __init__(self, max_distance: float, ttl_seconds: int, max_entries: int):
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._index: Dict[Tuple, List[str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "invalidations": 0
+        }
+    
+    @staticmethod
+    def make_doc_key(kb_documents: List[KBDocument]) -> Tuple:
+        return tuple(sorted(
+            (doc.doc_id, hashlib.sha1(doc.content.encode("utf-8")).hexdigest()[:16])
+            for doc in kb_documents
+        ))
+    
+    def lookup(self, query_embedding: np.ndarray, kb_documents: List[KBDocument]) -> Optional[Dict]:
+        doc_key = self.make_doc_key(kb_documents)
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry_ids = []
+            for entry_id in list(self._index.get(doc_key, [])):
+                if self._entries[entry_id]["expires_at"] > now:
+                    entry_ids.append(entry_id)
+                else:
+                    self._remove(entry_id)
+            
+            if not entry_ids:
+                self._stats["misses"] += 1
+                return None
+            
+            embeddings = np.vstack([self._entries[entry_id]["embedding"] for entry_id in entry_ids])
+            distances = 1.0 - embeddings @ query
+            best = int(np.argmin(distances))
+            
+            if distances[best] > self.max_distance:
+                self._stats["misses"] += 1
+                return None
+            
+            self._stats["hits"] += 1
+            entry = self._entries[entry_ids[best]]
+            
+            return {
+                "draft_text": entry["draft_text"],
+                "confidence": entry["confidence"],
+                "source_ticket_id": entry["ticket_id"],
+                "distance": round(float(distances[best]), 4)
+            }
+    
+    def store(
+        self,
+        query_embedding: np.ndarray,
+        kb_documents: List[KBDocument],
+        draft_text: str,
+        confidence: float,
+        ticket_id: str
+    ):
+        doc_key = self.make_doc_key(kb_documents)
+        entry_id = uuid.uuid4().hex
+        
+        with self._lock:
+            self._entries[entry_id] = {
+                "doc_key": doc_key,
+                "embedding": self._normalize(query_embedding),
+                "draft_text": draft_text,
+                "confidence": confidence,
+                "ticket_id": ticket_id,
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            self._index.setdefault(doc_key, []).append(entry_id)
+            self._stats["stores"] += 1
+            
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+    
+    def invalidate_documents(self, doc_ids: Iterable[str]):
+        doc_ids = set(doc_ids)
+        
+        with self._lock:
+            stale_keys = [
+                doc_key for doc_key in self._index
+                if any(doc_id in doc_ids for doc_id, _ in doc_key)
+            ]
+            
+            removed = 0
+            for doc_key in stale_keys:
+                for entry_id in list(self._index.get(doc_key, [])):
+                    self._remove(entry_id)
+                    removed += 1
+            
+            self._stats["invalidations"] += removed
+        
+        if removed:
+            logger.info(f"Invalidated {removed} cached responses for re-indexed documents")
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_distance"] = self.max_distance
+        
+        return stats
+    
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id)
+        entry_ids = self._index[entry["doc_key"]]
+        entry_ids.remove(entry_id)
+        if not entry_ids:
+            del self._index[entry["doc_key"]]
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
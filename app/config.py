@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
-from typing import Optional
+from typing import Optional, List
 import os
 
 
@@ -19,6 +19,18 @@ class Settings(BaseSettings):
     azure_location: str = Field(default="eastus", description="Azure region")
     azure_text_analytics_endpoint: str = Field(..., description="Azure Text Analytics endpoint URL")
     azure_text_analytics_key: str = Field(..., description="Azure Text Analytics API key")
+    azure_nlp_analysis_mode: str = Field(default="concurrent", description="Text Analytics strategy: concurrent, actions or sequential")
+    
+    nlp_keywords_path: Optional[str] = Field(None, description="JSON file with intent and priority keyword tables")
+    
+    local_intent_mode: str = Field(default="off", description="Local embedding intent classifier: off, shadow or tiered")
+    local_intent_margin_threshold: float = Field(default=0.08, description="Minimum top-1/top-2 centroid margin to skip Azure analysis and derive sentiment and priority from keywords")
+    local_intent_examples_path: Optional[str] = Field(None, description="JSON file with labeled intent examples")
+    
+    nlp_cache_enabled: bool = Field(default=True, description="Cache NLP analysis results by normalized ticket text")
+    nlp_cache_max_entries: int = Field(default=10000, description="Maximum in-process NLP cache entries")
+    nlp_cache_ttl_seconds: int = Field(default=3600, description="NLP cache entry time-to-live")
+    nlp_cache_persist: bool = Field(default=False, description="Share NLP cache entries through PostgreSQL")
     
     gcp_project_id: str = Field(..., description="GCP project ID")
     gcp_region: str = Field(default="us-central1", description="GCP region")
@@ -29,11 +41,94 @@ class Settings(BaseSettings):
     pinecone_index_name: str = Field(default="ticket-kb", description="Pinecone index name")
     
     ollama_base_url: str = Field(..., description="Ollama server URL on EC2")
+    ollama_backend_urls: str = Field(default="", description="Comma-separated Ollama URLs to load balance, defaults to ollama_base_url")
+    ollama_health_check_interval_seconds: float = Field(default=15.0, description="Interval between Ollama backend health checks")
+    ollama_eject_after_failures: int = Field(default=3, description="Consecutive failures before an Ollama backend is ejected")
+    ollama_eject_seconds: float = Field(default=30.0, description="How long an ejected Ollama backend is skipped")
+    ollama_slow_host_seconds: float = Field(default=25.0, description="Latency EWMA above which an Ollama backend is ejected")
+    llm_concurrency_per_backend: int = Field(default=2, description="Concurrent generations admitted per available Ollama backend")
+    llm_admission_deadline_seconds: float = Field(default=30.0, description="Maximum LLM queue wait before rejecting with 429")
+    llm_initial_service_seconds: float = Field(default=10.0, description="Initial generation time estimate for queue wait prediction")
+    ollama_max_connections: int = Field(default=20, description="Maximum pooled connections to Ollama")
+    ollama_max_keepalive_connections: int = Field(default=10, description="Maximum idle keep-alive connections to Ollama")
+    ollama_keepalive_expiry_seconds: float = Field(default=60.0, description="Idle keep-alive connection lifetime")
+    ollama_connect_timeout_seconds: float = Field(default=5.0, description="Ollama connection timeout")
+    ollama_read_timeout_seconds: Optional[float] = Field(None, description="Ollama read timeout, defaults to request_timeout_seconds")
+    ollama_connect_retries: int = Field(default=2, description="Retries on Ollama connection errors")
+    llm_model: str = Field(default="qwen2.5:3b", description="Ollama model used for drafting and as the large cascade tier")
+    llm_cascade_enabled: bool = Field(default=False, description="Route easy tickets to llm_small_model and escalate low-confidence drafts")
+    llm_small_model: str = Field(default="qwen2.5:1.5b", description="Smaller, faster Ollama model for easy tickets")
+    llm_cascade_simple_intents: str = Field(default="password_reset,account_issue,question", description="Comma-separated intents eligible for the small model")
+    llm_cascade_large_priorities: str = Field(default="urgent,high", description="Comma-separated priorities always drafted by the large model")
+    llm_cascade_min_similarity: float = Field(default=0.8, description="Best KB similarity required to use the small model")
+    llm_cascade_escalation_threshold: float = Field(default=0.6, description="Small-model draft confidence below which the large model redrafts")
+    ollama_keep_alive: str = Field(default="30m", description="How long Ollama keeps the model loaded after a request")
+    ollama_warmup_enabled: bool = Field(default=True, description="Preload the model on every Ollama backend at startup")
+    ollama_keep_alive_refresh_seconds: float = Field(default=240.0, description="Idle time after which a backend receives a keep-alive refresh")
+    ollama_cold_load_threshold_seconds: float = Field(default=0.5, description="Model load time above which a generation counts as a cold start")
+    llm_num_ctx: int = Field(default=4096, description="Context window requested from Ollama in tokens")
+    llm_max_tokens: int = Field(default=500, description="Maximum tokens generated per draft")
+    llm_budget_enabled: bool = Field(default=True, description="Derive per-intent num_predict budgets from drafted response history")
+    llm_budget_percentile: float = Field(default=95.0, description="Percentile of historical draft length used as the per-intent budget")
+    llm_budget_margin: float = Field(default=0.2, description="Relative headroom added on top of the percentile draft length")
+    llm_budget_min_tokens: int = Field(default=96, description="Lower bound for a learned generation budget")
+    llm_budget_min_samples: int = Field(default=20, description="Drafts required before an intent gets its own budget")
+    llm_budget_history_limit: int = Field(default=5000, description="Most recent drafts considered when learning budgets")
+    llm_budget_refresh_seconds: float = Field(default=900.0, description="Interval between generation budget refreshes")
+    llm_breaker_enabled: bool = Field(default=True, description="Fail drafting fast while the LLM is erroring or stalling")
+    llm_breaker_window: int = Field(default=20, description="Recent LLM calls considered by the circuit breaker")
+    llm_breaker_min_calls: int = Field(default=5, description="Calls required in the window before the breaker can open")
+    llm_breaker_failure_rate: float = Field(default=0.5, description="Failure rate that opens the circuit breaker")
+    llm_breaker_slow_call_seconds: float = Field(default=20.0, description="Call duration counted as slow by the circuit breaker")
+    llm_breaker_slow_call_rate: float = Field(default=0.8, description="Slow call rate that opens the circuit breaker")
+    llm_breaker_open_seconds: float = Field(default=30.0, description="How long the breaker stays open before half-open probing")
+    llm_breaker_half_open_probes: int = Field(default=1, description="Successful probes required to close the breaker")
+    llm_hedging_enabled: bool = Field(default=False, description="Duplicate slow LLM requests to a second Ollama backend")
+    llm_hedge_percentile: float = Field(default=95.0, description="Time-to-first-token percentile used as the hedge delay")
+    llm_hedge_min_delay_seconds: float = Field(default=0.5, description="Lower bound for the hedge delay")
+    llm_hedge_initial_delay_seconds: float = Field(default=3.0, description="Hedge delay before enough first-token samples exist")
+    llm_hedge_min_samples: int = Field(default=20, description="First-token samples required before using the percentile delay")
+    llm_prompt_reserve_tokens: int = Field(default=400, description="Tokens reserved for the ticket and prompt instructions")
+    kb_context_packing_enabled: bool = Field(default=True, description="Pack KB context to the most relevant sentences within a token budget")
+    kb_context_budget_tokens: Optional[int] = Field(None, description="KB context token budget, defaults to the context window minus generation and prompt reserves")
     
     database_url: str = Field(..., description="PostgreSQL connection string")
     
-    kb_backend: str = Field(default="local", description="Knowledge base backend type")
+    supervisor_parallel_retrieval: bool = Field(default=False, description="Run NLP analysis and KB retrieval concurrently")
+    retrieval_overfetch_factor: int = Field(default=4, description="Candidate multiplier for unfiltered parallel retrieval")
+    
+    response_cache_enabled: bool = Field(default=True, description="Reuse drafts for near-duplicate tickets with the same KB documents")
+    response_cache_max_distance: float = Field(default=0.05, description="Maximum cosine distance between query embeddings for reuse")
+    response_cache_ttl_seconds: int = Field(default=1800, description="Cached draft time-to-live")
+    response_cache_max_entries: int = Field(default=5000, description="Maximum cached drafts")
+    
+    embedding_engine: str = Field(default="pytorch", description="Embedding inference engine: pytorch or onnx (int8 quantized)")
+    embedding_onnx_threads: int = Field(default=0, description="ONNX Runtime intra-op threads, 0 uses all cores")
+    embedding_onnx_path: str = Field(default="./.onnx_models", description="Directory for exported and quantized ONNX models")
+    embedding_cache_enabled: bool = Field(default=True, description="Cache embeddings by content hash and model name")
+    embedding_cache_max_entries: int = Field(default=20000, description="Maximum embeddings held in the in-memory LRU tier")
+    embedding_cache_persist: bool = Field(default=True, description="Back batch (KB and classifier) embeddings with an append-only memory-mapped file, query embeddings stay in memory")
+    embedding_cache_path: str = Field(default="./.embedding_cache", description="Directory for the on-disk embedding cache")
+    embedding_cache_dtype: str = Field(default="float16", description="On-disk embedding precision: float16 or float32")
+    
+    embedding_batching_enabled: bool = Field(default=True, description="Coalesce concurrent single-text embedding requests into one batched encode")
+    embedding_batch_max_size: int = Field(default=32, description="Maximum texts per batched encode")
+    embedding_batch_max_wait_ms: float = Field(default=5.0, description="Longest a request waits for other texts to join its batch")
+    
+    kb_backend: str = Field(default="local", description="Knowledge base backend type: local or pinecone")
     kb_path: str = Field(default="./knowledge_base", description="Path to local KB files")
+    kb_index_type: str = Field(default="flat", description="Local vector index type: flat (exact) or ivf (approximate, int8)")
+    kb_ivf_nlist: int = Field(default=0, description="IVF cluster count, 0 picks sqrt(vector count) at training time")
+    kb_ivf_nprobe: int = Field(default=8, description="IVF clusters scanned per query")
+    kb_ivf_rescore_factor: int = Field(default=4, description="Candidates per result re-scored with float vectors")
+    kb_ivf_train_min_vectors: int = Field(default=10000, description="Vectors required before IVF clustering, smaller indexes scan all int8 codes")
+    kb_ingest_batch_size: int = Field(default=64, description="Documents embedded per ingestion batch")
+    kb_ingest_workers: int = Field(default=2, description="Embedding worker processes used by KB ingestion")
+    kb_ingest_concurrency: int = Field(default=4, description="Vector store upsert requests in flight during KB ingestion")
+    kb_chunk_max_chars: int = Field(default=1000, description="Maximum characters per KB chunk, chunks are re-embedded only when their content changes")
+    kb_doc_store_enabled: bool = Field(default=True, description="Keep Pinecone KB text in PostgreSQL instead of vector metadata")
+    kb_doc_store_max_entries: int = Field(default=10000, description="Maximum KB documents cached in process by the doc store")
+    kb_doc_store_ttl_seconds: int = Field(default=300, description="How long a worker serves cached KB text before re-reading it")
     
     log_level: str = Field(default="INFO", description="Logging level")
     request_timeout_seconds: int = Field(default=30, description="HTTP request timeout")
@@ -44,6 +139,48 @@ class Settings(BaseSettings):
             raise ValueError(f"GCP credentials file not found at {v}")
         return v
     
+    @field_validator("azure_nlp_analysis_mode")
+    def validate_azure_nlp_analysis_mode(cls, v):
+        valid_modes = ["concurrent", "actions", "sequential"]
+        if v.lower() not in valid_modes:
+            raise ValueError(f"azure_nlp_analysis_mode must be one of {valid_modes}")
+        return v.lower()
+    
+    @field_validator("local_intent_mode")
+    def validate_local_intent_mode(cls, v):
+        valid_modes = ["off", "shadow", "tiered"]
+        if v.lower() not in valid_modes:
+            raise ValueError(f"local_intent_mode must be one of {valid_modes}")
+        return v.lower()
+    
+    @field_validator("kb_backend")
+    def validate_kb_backend(cls, v):
+        valid_backends = ["local", "pinecone"]
+        if v.lower() not in valid_backends:
+            raise ValueError(f"kb_backend must be one of {valid_backends}")
+        return v.lower()
+    
+    @field_validator("kb_index_type")
+    def validate_kb_index_type(cls, v):
+        valid_types = ["flat", "ivf"]
+        if v.lower() not in valid_types:
+            raise ValueError(f"kb_index_type must be one of {valid_types}")
+        return v.lower()
+    
+    @field_validator("embedding_engine")
+    def validate_embedding_engine(cls, v):
+        valid_engines = ["pytorch", "onnx"]
+        if v.lower() not in valid_engines:
+            raise ValueError(f"embedding_engine must be one of {valid_engines}")
+        return v.lower()
+    
+    @field_validator("embedding_cache_dtype")
+    def validate_embedding_cache_dtype(cls, v):
+        valid_dtypes = ["float16", "float32"]
+        if v.lower() not in valid_dtypes:
+            raise ValueError(f"embedding_cache_dtype must be one of {valid_dtypes}")
+        return v.lower()
+    
     @field_validator("log_level")
     def validate_log_level(cls, v):
         valid_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -51,6 +188,18 @@ class Settings(BaseSettings):
             raise ValueError(f"log_level must be one of {valid_levels}")
         return v.upper()
     
+    def get_ollama_backend_urls(self) -> List[str]:
+        urls = [url.strip() for url in self.ollama_backend_urls.split(",") if url.strip()]
+        return urls or [self.ollama_base_url]
+    
+    def get_csv_setting(self, name: str) -> List[str]:
+        return [value.strip() for value in getattr(self, name).split(",") if value.strip()]
+    
+    def get_kb_context_budget(self) -> int:
+        if self.kb_context_budget_tokens is not None:
+            return self.kb_context_budget_tokens
+        return max(self.llm_num_ctx - self.llm_max_tokens - self.llm_prompt_reserve_tokens, 0)
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -64,3 +64,24 @@ class DraftedResponseLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     ticket = relationship("Ticket", back_populates="drafted_responses")
+
+
+class NLPAnalysisCacheEntry(Base):
+    __tablename__ = "nlp_analysis_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class KBDocumentText(Base):
+    __tablename__ = "kb_documents"
+    
+    doc_id = Column(String(512), primary_key=True)
+    text = Column(Text, nullable=False)
+    source = Column(String(512), nullable=True)
+    category = Column(String(100), nullable=True, index=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -1,8 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
 from app.config import settings
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, AsyncGenerator
 
 
 engine = create_engine(
@@ -16,6 +18,21 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def get_async_database_url(database_url: str) -> str:
+    return make_url(database_url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20,
+    echo=settings.log_level == "DEBUG"
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
@@ -35,3 +52,8 @@ def get_db_context():
         raise
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
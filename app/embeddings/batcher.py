@@ -0,0 +1,125 @@
+from app.metrics import LatencyHistogram
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import asyncio
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class EmbeddingBatcher:
+    
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        
+        self._queue: "queue.Queue[tuple[str, float, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        
+        self.wait_time = LatencyHistogram(BATCH_LATENCY_BUCKETS)
+        self.encode_time = LatencyHistogram(BATCH_LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "max_batch_size_seen": 0,
+            "encode_seconds": 0.0
+        }
+    
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        
+        future: Future = Future()
+        self._queue.put((text, time.monotonic(), future))
+        return future
+    
+    def embed(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+    
+    async def aembed(self, text: str) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text))
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        stats["mean_batch_size"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["throughput_per_second"] = round(stats["items"] / stats["encode_seconds"], 1) if stats["encode_seconds"] else 0.0
+        stats["encode_seconds"] = round(stats["encode_seconds"], 4)
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait_seconds * 1000
+        stats["queue_depth"] = self._queue.qsize()
+        stats["added_latency"] = self.wait_time.snapshot()
+        stats["encode_latency"] = self.encode_time.snapshot()
+        return stats
+    
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][1] + self.max_wait_seconds
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._encode_batch(batch)
+            except Exception as e:
+                logger.error(f"Embedding batcher failed on a batch of {len(batch)} texts: {e}")
+    
+    def _encode_batch(self, batch: List[tuple]):
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        
+        started = time.monotonic()
+        for _, submitted, _ in batch:
+            self.wait_time.observe(started - submitted)
+        
+        try:
+            embeddings = self.encode([text for text, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(batch)} texts failed: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        elapsed = time.monotonic() - started
+        self.encode_time.observe(elapsed)
+        
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items"] += len(batch)
+            self._stats["encode_seconds"] += elapsed
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(batch))
+        
+        for (_, _, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
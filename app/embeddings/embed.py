@@ -1,34 +1,147 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from app.cache.embedding_cache import EmbeddingCache
+from app.embeddings.batcher import EmbeddingBatcher
+from app.config import settings
+from typing import List, Dict, Optional
 import numpy as np
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def embedding_model_id(model_name: str = DEFAULT_MODEL_NAME) -> str:
+    if settings.embedding_engine == "pytorch":
+        return model_name
+    return f"{model_name}-{settings.embedding_engine}-int8"
+
 
 class EmbeddingGenerator:
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        logger.info(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        logger.info(f"Loading embedding model: {model_name} ({settings.embedding_engine} engine)")
+        self.model_name = model_name
+        self.model = self._load_model(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
         logger.info(f"Model loaded. Embedding dimension: {self.dimension}")
+        
+        self.cache: Optional[EmbeddingCache] = None
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                model_name=embedding_model_id(model_name),
+                dimension=self.dimension,
+                max_entries=settings.embedding_cache_max_entries,
+                path=settings.embedding_cache_path if settings.embedding_cache_persist else None,
+                dtype=settings.embedding_cache_dtype
+            )
+        
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if settings.embedding_batching_enabled:
+            self.batcher = EmbeddingBatcher(
+                encode=lambda texts: self.model.encode(texts, convert_to_numpy=True, batch_size=len(texts)),
+                max_batch_size=settings.embedding_batch_max_size,
+                max_wait_ms=settings.embedding_batch_max_wait_ms
+            )
     
     def generate_embedding(self, text: str) -> List[float]:
+        return self.embed(text).tolist()
+    
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        return (await self.aembed(text)).tolist()
+    
+    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_batch(texts, show_progress_bar=True).tolist()
+    
+    def embed(self, text: str) -> np.ndarray:
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+            if self.cache:
+                cached = self.cache.get(text)
+                if cached is not None:
+                    return cached
+            
+            if self.batcher:
+                embedding = self.batcher.embed(text)
+            else:
+                embedding = self.model.encode(text, convert_to_numpy=True)
+            embedding = np.asarray(embedding, dtype=np.float32)
+            
+            if self.cache:
+                self.cache.set(text, embedding, persist=False)
+            
+            return embedding
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def aembed(self, text: str) -> np.ndarray:
+        if not self.batcher:
+            return await asyncio.to_thread(self.embed, text)
+        
         try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-            return embeddings.tolist()
+            if self.cache:
+                cached = self.cache.get(text)
+                if cached is not None:
+                    return cached
+            
+            embedding = np.asarray(await self.batcher.aembed(text), dtype=np.float32)
+            
+            if self.cache:
+                self.cache.set(text, embedding, persist=False)
+            
+            return embedding
+        except Exception as e:
+            logger.error(f"Failed to generate embedding: {e}")
+            raise
+    
+    def embed_batch(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        try:
+            if not self.cache:
+                embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+                return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.dimension)
+            
+            embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+            cached = self.cache.get_many(texts)
+            
+            missing_rows: Dict[str, List[int]] = {}
+            for row, (text, embedding) in enumerate(zip(texts, cached)):
+                if embedding is None:
+                    missing_rows.setdefault(text, []).append(row)
+                else:
+                    embeddings[row] = embedding
+            
+            if missing_rows:
+                missing = list(missing_rows)
+                encoded = np.asarray(
+                    self.model.encode(missing, convert_to_numpy=True, show_progress_bar=show_progress_bar),
+                    dtype=np.float32
+                )
+                self.cache.set_many(missing, encoded)
+                
+                for text, embedding in zip(missing, encoded):
+                    embeddings[missing_rows[text]] = embedding
+            
+            logger.info(f"Encoded {len(missing_rows)} of {len(texts)} texts, {len(texts) - sum(len(rows) for rows in missing_rows.values())} served from cache")
+            return embeddings
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {e}")
             raise
     
+    def _load_model(self, model_name: str):
+        if settings.embedding_engine == "onnx":
+            from app.embeddings.onnx_engine import OnnxEmbeddingEngine
+            return OnnxEmbeddingEngine(model_name, threads=settings.embedding_onnx_threads)
+        
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    
     def get_dimension(self) -> int:
         return self.dimension
+    
+    def get_stats(self) -> Dict:
+        return {
+            "model": self.model_name,
+            "engine": settings.embedding_engine,
+            "cache": self.cache.get_stats() if self.cache else None,
+            "batching": self.batcher.get_stats() if self.batcher else None
+        }
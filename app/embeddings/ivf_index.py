@@ -0,0 +1,620 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Union, Sequence
+import numpy as np
+import threading
+import fcntl
+import time
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+FORMAT_VERSION = 2
+ROW_FILES = {
+    "vectors": ("f32", np.float32, True),
+    "codes": ("i8", np.int8, True),
+    "scales": ("f32", np.float32, False),
+    "category_codes": ("i32", np.int32, False),
+    "assignments": ("i32", np.int32, False)
+}
+RECORDS_FILE = "records"
+TOMBSTONES_FILE = "tombstones"
+CENTROIDS_FILE = "centroids"
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 50000
+ASSIGN_CHUNK_SIZE = 65536
+COMPACT_DEAD_FRACTION = 0.25
+
+
+class IVFVectorIndex:
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        rescore_factor: Optional[int] = None,
+        train_min_vectors: Optional[int] = None
+    ):
+        self.path = os.path.join(path or settings.kb_path, "ivf_index")
+        self.nlist = nlist if nlist is not None else settings.kb_ivf_nlist
+        self.nprobe = nprobe or settings.kb_ivf_nprobe
+        self.rescore_factor = rescore_factor or settings.kb_ivf_rescore_factor
+        self.train_min_vectors = train_min_vectors or settings.kb_ivf_train_min_vectors
+        
+        self.dimension: Optional[int] = None
+        self._snapshot: Dict = {}
+        self._meta_version: Optional[tuple] = None
+        self._lock = threading.Lock()
+    
+    def initialize_index(self, dimension: int, metric: str = "cosine"):
+        if metric != "cosine":
+            raise ValueError(f"IVF vector index only supports cosine metric, got {metric}")
+        
+        self.dimension = dimension
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._load()
+        
+        logger.info(f"Loaded {len(self.id_to_row)} vectors from IVF vector index at {self.path}")
+    
+    def upsert_documents(self, documents: List[Dict]):
+        self._require_initialized()
+        
+        documents = list({doc["id"]: doc for doc in documents}.values())
+        if not documents:
+            return
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._reload_if_changed()
+            snapshot = self._snapshot
+            start = snapshot["count"]
+            
+            vectors = self._normalize(np.asarray([doc["embedding"] for doc in documents], dtype=np.float32))
+            codes, scales = self._quantize(vectors)
+            
+            for doc in documents:
+                category = doc.get("category", "general")
+                if category not in self.category_lookup:
+                    self.category_lookup[category] = len(self.meta["category_names"])
+                    self.meta["category_names"].append(category)
+            
+            replaced = [self.id_to_row[doc["id"]] for doc in documents if doc["id"] in self.id_to_row]
+            assignments = self._assign(vectors, snapshot["centroids"]) if snapshot["centroids"] is not None else np.full(len(documents), -1, dtype=np.int32)
+            
+            self._append({
+                "vectors": vectors,
+                "codes": codes,
+                "scales": scales,
+                "category_codes": np.array([self.category_lookup[doc.get("category", "general")] for doc in documents], dtype=np.int32),
+                "assignments": assignments
+            }, [[doc["id"], doc["text"], doc.get("source", "unknown")] for doc in documents], replaced)
+            
+            for offset, doc in enumerate(documents):
+                self.id_to_row[doc["id"]] = start + offset
+            
+            self._extend_snapshot(documents, assignments, replaced)
+            self._maintain()
+        
+        logger.info(f"Upserted {len(documents)} documents to IVF vector index")
+    
+    def query(
+        self,
+        query_embedding: Union[np.ndarray, List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Dict]:
+        self._require_initialized()
+        self._refresh()
+        
+        snapshot = self._snapshot
+        category = self._category_filter(filter)
+        category_code = None
+        if category is not None:
+            if category not in snapshot["category_names"]:
+                return []
+            category_code = snapshot["category_names"].index(category)
+        
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        
+        candidates = self._probe(snapshot, query, nprobe or self.nprobe, category_code)
+        if category_code is not None and len(candidates) < top_k:
+            candidates = self._live_rows(snapshot, category_code)
+        
+        rows, scores = self._rescore(snapshot, query, candidates, top_k)
+        
+        results = []
+        for row, score in zip(rows, scores):
+            results.append({
+                "id": snapshot["ids"][row],
+                "score": float(score),
+                "text": snapshot["texts"][row],
+                "source": snapshot["sources"][row],
+                "category": snapshot["category_names"][snapshot["category_codes"][row]]
+            })
+        
+        logger.info(f"Retrieved {len(results)} documents from IVF vector index")
+        return results
+    
+    def delete_documents(self, ids: List[str]):
+        self._require_initialized()
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._reload_if_changed()
+            rows = [self.id_to_row.pop(doc_id) for doc_id in dict.fromkeys(ids) if doc_id in self.id_to_row]
+            if not rows:
+                return
+            
+            self._append({}, [], rows)
+            self._extend_snapshot([], np.zeros(0, dtype=np.int32), rows)
+            self._maintain()
+        
+        logger.info(f"Deleted {len(rows)} documents from IVF vector index")
+    
+    def delete_all(self):
+        self._require_initialized()
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            for name in os.listdir(self.path):
+                if name != LOCK_FILE:
+                    os.remove(os.path.join(self.path, name))
+            self._load()
+        
+        logger.info("Deleted all vectors from IVF vector index")
+    
+    def get_stats(self) -> Dict:
+        self._require_initialized()
+        self._refresh()
+        
+        snapshot = self._snapshot
+        return {
+            "total_vector_count": int(snapshot["alive"].sum()),
+            "dimension": self.dimension,
+            "index_fullness": 0.0,
+            "stored_rows": snapshot["count"],
+            "trained": snapshot["centroids"] is not None,
+            "nlist": len(snapshot["centroids"]) if snapshot["centroids"] is not None else 0,
+            "nprobe": self.nprobe,
+            "rescore_factor": self.rescore_factor,
+            "code_bytes": int(snapshot["codes"].nbytes)
+        }
+    
+    def recall_report(
+        self,
+        num_queries: int = 100,
+        top_k: int = 10,
+        nprobe_values: Sequence[int] = (1, 2, 4, 8, 16, 32)
+    ) -> Dict:
+        self._require_initialized()
+        self._refresh()
+        
+        snapshot = self._snapshot
+        live = self._live_rows(snapshot)
+        if not len(live):
+            return {"queries": 0, "exact": None, "ivf": []}
+        
+        rng = np.random.default_rng(0)
+        query_rows = rng.choice(live, size=min(num_queries, len(live)), replace=False)
+        queries = np.asarray(snapshot["vectors"][np.sort(query_rows)])
+        live_vectors = np.asarray(snapshot["vectors"][live])
+        
+        exact_ids = []
+        exact_latency = []
+        for query in queries:
+            start = time.perf_counter()
+            scores = live_vectors @ query
+            top = live[np.argsort(-scores)[:top_k]]
+            exact_latency.append(time.perf_counter() - start)
+            exact_ids.append(set(top.tolist()))
+        
+        report = {
+            "queries": len(queries),
+            "top_k": top_k,
+            "exact": self._latency_summary(exact_latency),
+            "ivf": []
+        }
+        
+        for nprobe in nprobe_values:
+            latency = []
+            hits = 0
+            for query, expected in zip(queries, exact_ids):
+                start = time.perf_counter()
+                rows, _ = self._rescore(snapshot, query, self._probe(snapshot, query, nprobe, None), top_k)
+                latency.append(time.perf_counter() - start)
+                hits += len(expected.intersection(rows.tolist()))
+            
+            report["ivf"].append({
+                "nprobe": nprobe,
+                "recall": round(hits / (len(queries) * top_k), 4),
+                **self._latency_summary(latency)
+            })
+        
+        return report
+    
+    def _probe(self, snapshot: Dict, query: np.ndarray, nprobe: int, category_code: Optional[int]) -> np.ndarray:
+        centroids = snapshot["centroids"]
+        if centroids is None:
+            return self._live_rows(snapshot, category_code)
+        
+        nprobe = min(nprobe, len(centroids))
+        nearest = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([snapshot["lists"][cluster] for cluster in nearest] + [snapshot["unassigned"]])
+        
+        mask = snapshot["alive"][rows]
+        if category_code is not None:
+            mask &= snapshot["category_codes"][rows] == category_code
+        return rows[mask]
+    
+    def _rescore(self, snapshot: Dict, query: np.ndarray, rows: np.ndarray, top_k: int):
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+        
+        approx = (snapshot["codes"][rows].astype(np.float32) @ query) * snapshot["scales"][rows]
+        
+        shortlist_size = min(top_k * self.rescore_factor, len(rows))
+        shortlist = rows[np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]]
+        shortlist = np.sort(shortlist)
+        
+        exact = np.asarray(snapshot["vectors"][shortlist]) @ query
+        
+        k = min(top_k, len(shortlist))
+        order = np.argsort(-exact)[:k]
+        return shortlist[order], exact[order]
+    
+    @staticmethod
+    def _live_rows(snapshot: Dict, category_code: Optional[int] = None) -> np.ndarray:
+        mask = snapshot["alive"].copy()
+        if category_code is not None:
+            mask &= snapshot["category_codes"] == category_code
+        return np.flatnonzero(mask)
+    
+    def _maintain(self):
+        snapshot = self._snapshot
+        live = len(self.id_to_row)
+        dead = snapshot["count"] - live
+        
+        if live >= self.train_min_vectors and (snapshot["centroids"] is None or live >= 4 * self.meta["trained_count"]):
+            self._rewrite(train=True)
+        elif dead and dead >= COMPACT_DEAD_FRACTION * snapshot["count"]:
+            self._rewrite(train=False)
+    
+    def _rewrite(self, train: bool):
+        snapshot = self._snapshot
+        live = self._live_rows(snapshot)
+        centroids = self._train(snapshot["vectors"], live) if train else snapshot["centroids"]
+        generation = self.meta["generation"] + 1
+        
+        os.makedirs(self.path, exist_ok=True)
+        files = {name: open(self._file(name, generation), "wb") for name in ROW_FILES}
+        try:
+            for start in range(0, len(live), ASSIGN_CHUNK_SIZE):
+                rows = live[start:start + ASSIGN_CHUNK_SIZE]
+                for name, f in files.items():
+                    if name == "assignments" and train:
+                        self._assign(np.asarray(snapshot["vectors"][rows]), centroids).tofile(f)
+                    else:
+                        np.asarray(snapshot[name][rows]).tofile(f)
+            for f in files.values():
+                self._sync(f)
+        finally:
+            for f in files.values():
+                f.close()
+        
+        with open(self._file(RECORDS_FILE, generation), "wb") as f:
+            records = b"".join(self._encode_record([snapshot["ids"][row], snapshot["texts"][row], snapshot["sources"][row]]) for row in live)
+            f.write(records)
+            self._sync(f)
+        open(self._file(TOMBSTONES_FILE, generation), "wb").close()
+        if centroids is not None:
+            with open(self._file(CENTROIDS_FILE, generation), "wb") as f:
+                centroids.astype(np.float32).tofile(f)
+                self._sync(f)
+        
+        previous = self.meta["generation"]
+        self._commit({
+            **self.meta,
+            "generation": generation,
+            "count": len(live),
+            "records_bytes": len(records),
+            "tombstones": 0,
+            "nlist": len(centroids) if centroids is not None else 0,
+            "trained_count": len(live) if train else self.meta["trained_count"]
+        })
+        self._remove_generation(previous)
+        self._load()
+        
+        logger.info(
+            f"{'Trained' if train else 'Compacted'} IVF vector index: {len(live)} live of {snapshot['count']} stored rows"
+            + (f", {len(centroids)} lists" if train else "")
+        )
+    
+    def _train(self, vectors: np.ndarray, live: np.ndarray) -> np.ndarray:
+        nlist = self.nlist or max(int(np.sqrt(len(live))), 1)
+        nlist = min(nlist, len(live))
+        
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(len(live), max(KMEANS_SAMPLE_SIZE, nlist)), replace=False))
+        points = np.asarray(vectors[sample])
+        
+        centroids = points[rng.choice(len(points), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(points @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = points[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+                else:
+                    centroids[cluster] = points[rng.integers(len(points))]
+            centroids = self._normalize(centroids)
+        
+        return centroids.astype(np.float32)
+    
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+            chunk = vectors[start:start + ASSIGN_CHUNK_SIZE]
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+    
+    @staticmethod
+    def _build_lists(assignments: np.ndarray, nlist: int):
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(-1, nlist + 1))
+        return order[boundaries[0]:boundaries[1]], [order[boundaries[i + 1]:boundaries[i + 2]] for i in range(nlist)]
+    
+    def _append(self, arrays: Dict[str, np.ndarray], records: List[list], tombstones: List[int]):
+        os.makedirs(self.path, exist_ok=True)
+        generation = self.meta["generation"]
+        count = self.meta["count"]
+        added = len(records)
+        
+        for name, (_, dtype, per_dimension) in ROW_FILES.items():
+            width = np.dtype(dtype).itemsize * (self.dimension if per_dimension else 1)
+            with open(self._file(name, generation), "ab") as f:
+                f.truncate(count * width)
+                if added:
+                    np.asarray(arrays[name], dtype=dtype).tofile(f)
+                self._sync(f)
+        
+        encoded = b"".join(self._encode_record(record) for record in records)
+        with open(self._file(RECORDS_FILE, generation), "ab") as f:
+            f.truncate(self.meta["records_bytes"])
+            f.write(encoded)
+            self._sync(f)
+        
+        with open(self._file(TOMBSTONES_FILE, generation), "ab") as f:
+            f.truncate(self.meta["tombstones"] * 8)
+            np.asarray(tombstones, dtype=np.int64).tofile(f)
+            self._sync(f)
+        
+        self._commit({
+            **self.meta,
+            "count": count + added,
+            "records_bytes": self.meta["records_bytes"] + len(encoded),
+            "tombstones": self.meta["tombstones"] + len(tombstones)
+        })
+    
+    def _commit(self, meta: Dict):
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+            self._sync(f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self.meta = meta
+        self._meta_version = self._stat_meta()
+    
+    def _extend_snapshot(self, documents: List[Dict], assignments: np.ndarray, dead_rows: List[int]):
+        snapshot = self._snapshot
+        start = snapshot["count"]
+        count = self.meta["count"]
+        
+        for doc in documents:
+            snapshot["ids"].append(doc["id"])
+            snapshot["texts"].append(doc["text"])
+            snapshot["sources"].append(doc.get("source", "unknown"))
+        
+        if count > len(self._alive_buffer):
+            buffer = np.zeros(max(count, 2 * len(self._alive_buffer)), dtype=bool)
+            buffer[:start] = self._alive_buffer[:start]
+            self._alive_buffer = buffer
+        self._alive_buffer[start:count] = True
+        self._alive_buffer[dead_rows] = False
+        
+        lists = snapshot["lists"]
+        unassigned = snapshot["unassigned"]
+        if len(documents) and snapshot["centroids"] is not None:
+            rows = np.arange(start, count)
+            lists = list(lists)
+            for cluster in np.unique(assignments):
+                lists[cluster] = np.concatenate([lists[cluster], rows[assignments == cluster]])
+        
+        self._snapshot = {
+            **snapshot,
+            **self._open_rows(self.meta["generation"], count),
+            "count": count,
+            "alive": self._alive_buffer[:count],
+            "category_names": list(self.meta["category_names"]),
+            "lists": lists,
+            "unassigned": unassigned
+        }
+    
+    def _load(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        meta_version = self._stat_meta()
+        meta = {
+            "version": FORMAT_VERSION,
+            "dimension": self.dimension,
+            "generation": 0,
+            "count": 0,
+            "records_bytes": 0,
+            "tombstones": 0,
+            "nlist": 0,
+            "trained_count": 0,
+            "category_names": []
+        }
+        
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            
+            if meta.get("version") != FORMAT_VERSION:
+                raise RuntimeError(
+                    f"IVF vector index at {self.path} uses an unsupported format, delete it and re-index"
+                )
+            if meta["dimension"] != self.dimension:
+                raise RuntimeError(
+                    f"IVF vector index at {self.path} has dimension {meta['dimension']}, expected {self.dimension}"
+                )
+        
+        generation = meta["generation"]
+        count = meta["count"]
+        
+        ids, texts, sources = [], [], []
+        if count:
+            with open(self._file(RECORDS_FILE, generation), "rb") as f:
+                data = f.read(meta["records_bytes"])
+            for line in data.splitlines():
+                doc_id, text, source = json.loads(line)
+                ids.append(doc_id)
+                texts.append(text)
+                sources.append(source)
+        
+        self._alive_buffer = np.ones(count, dtype=bool)
+        if meta["tombstones"]:
+            tombstones = np.fromfile(self._file(TOMBSTONES_FILE, generation), dtype=np.int64, count=meta["tombstones"])
+            self._alive_buffer[tombstones] = False
+        
+        centroids = None
+        if meta["nlist"]:
+            centroids = np.fromfile(
+                self._file(CENTROIDS_FILE, generation), dtype=np.float32, count=meta["nlist"] * self.dimension
+            ).reshape(meta["nlist"], self.dimension)
+        
+        rows = self._open_rows(generation, count)
+        unassigned, lists = np.zeros(0, dtype=np.int64), []
+        if centroids is not None:
+            unassigned, lists = self._build_lists(np.asarray(rows["assignments"]), len(centroids))
+        
+        self.meta = meta
+        self._meta_version = meta_version
+        self.category_lookup = {name: code for code, name in enumerate(meta["category_names"])}
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(ids) if self._alive_buffer[row]}
+        self._snapshot = {
+            **rows,
+            "count": count,
+            "ids": ids,
+            "texts": texts,
+            "sources": sources,
+            "alive": self._alive_buffer[:count],
+            "category_names": list(meta["category_names"]),
+            "centroids": centroids,
+            "lists": lists,
+            "unassigned": unassigned
+        }
+    
+    def _open_rows(self, generation: int, count: int) -> Dict[str, np.ndarray]:
+        rows = {}
+        for name, (_, dtype, per_dimension) in ROW_FILES.items():
+            shape = (count, self.dimension) if per_dimension else (count,)
+            if count:
+                rows[name] = np.memmap(self._file(name, generation), dtype=dtype, mode="r", shape=shape)
+            else:
+                rows[name] = np.zeros(shape, dtype=dtype)
+        return rows
+    
+    def _remove_generation(self, generation: int):
+        for name in list(ROW_FILES) + [RECORDS_FILE, TOMBSTONES_FILE, CENTROIDS_FILE]:
+            path = self._file(name, generation)
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _file(self, name: str, generation: int) -> str:
+        extension = ROW_FILES[name][0] if name in ROW_FILES else "bin"
+        return os.path.join(self.path, f"{name}.{generation}.{extension}")
+    
+    def _refresh(self):
+        if self._stat_meta() == self._meta_version:
+            return
+        
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._reload_if_changed()
+    
+    def _reload_if_changed(self):
+        if self._stat_meta() != self._meta_version:
+            self._load()
+            logger.info(f"Reloaded {len(self.id_to_row)} vectors changed by another process in {self.path}")
+    
+    def _stat_meta(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    @contextmanager
+    def _file_lock(self, operation: int):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _require_initialized(self):
+        if self.dimension is None:
+            raise RuntimeError("Index not initialized. Call initialize_index() first")
+    
+    @staticmethod
+    def _encode_record(record: list) -> bytes:
+        return json.dumps(record).encode("utf-8") + b"\n"
+    
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+    
+    @staticmethod
+    def _quantize(vectors: np.ndarray):
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    
+    @staticmethod
+    def _latency_summary(latency: List[float]) -> Dict:
+        latency_ms = np.asarray(latency) * 1000
+        return {
+            "mean_ms": round(float(latency_ms.mean()), 4),
+            "p95_ms": round(float(np.percentile(latency_ms, 95)), 4)
+        }
+    
+    @staticmethod
+    def _category_filter(filter: Optional[Dict]) -> Optional[str]:
+        if not filter or "category" not in filter:
+            return None
+        
+        condition = filter["category"]
+        if isinstance(condition, dict):
+            return condition.get("$eq")
+        return condition
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+if __name__ == "__main__":
+    from app.embeddings.embed import EmbeddingGenerator
+    
+    logging.basicConfig(level="INFO")
+    
+    index = IVFVectorIndex()
+    index.initialize_index(dimension=EmbeddingGenerator().get_dimension())
+    print(json.dumps(index.recall_report(), indent=2))
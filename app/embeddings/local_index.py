@@ -0,0 +1,406 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Union
+import numpy as np
+import threading
+import fcntl
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+FORMAT_VERSION = 2
+VECTORS_FILE = "vectors"
+RECORDS_FILE = "records"
+TOMBSTONES_FILE = "tombstones"
+
+REWRITE_CHUNK_SIZE = 65536
+COMPACT_DEAD_FRACTION = 0.25
+
+
+class LocalVectorIndex:
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.join(path or settings.kb_path, "index")
+        self.dimension: Optional[int] = None
+        self._snapshot: Dict = {}
+        self._meta_version: Optional[tuple] = None
+        self._lock = threading.Lock()
+    
+    def initialize_index(self, dimension: int, metric: str = "cosine"):
+        if metric != "cosine":
+            raise ValueError(f"Local vector index only supports cosine metric, got {metric}")
+        
+        self.dimension = dimension
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._load()
+        
+        logger.info(f"Loaded {len(self.id_to_row)} vectors from local vector index at {self.path}")
+    
+    def upsert_documents(self, documents: List[Dict]):
+        self._require_initialized()
+        
+        documents = list({doc["id"]: doc for doc in documents}.values())
+        if not documents:
+            return
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._reload_if_changed()
+            start = self.meta["count"]
+            vectors = self._normalize(np.asarray([doc["embedding"] for doc in documents], dtype=np.float32))
+            records = [
+                [doc["id"], doc["text"], doc.get("source", "unknown"), doc.get("category", "general")]
+                for doc in documents
+            ]
+            replaced = [self.id_to_row[doc["id"]] for doc in documents if doc["id"] in self.id_to_row]
+            
+            self._append(vectors, records, replaced)
+            
+            for offset, doc in enumerate(documents):
+                self.id_to_row[doc["id"]] = start + offset
+            
+            self._extend_snapshot(records, replaced)
+            self._maintain()
+        
+        logger.info(f"Upserted {len(documents)} documents to local vector index")
+    
+    def query(
+        self,
+        query_embedding: Union[np.ndarray, List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        self._require_initialized()
+        self._refresh()
+        
+        snapshot = self._snapshot
+        rows = None
+        
+        category = self._category_filter(filter)
+        if category is not None:
+            if category not in snapshot["partitions"]:
+                return []
+            rows = snapshot["partitions"][category]
+        
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        
+        if rows is None:
+            scores = snapshot["matrix"] @ query
+            alive = snapshot["alive"]
+        elif rows[-1] - rows[0] + 1 == len(rows):
+            scores = snapshot["matrix"][rows[0]:rows[-1] + 1] @ query
+            alive = snapshot["alive"][rows]
+        else:
+            scores = snapshot["matrix"][rows] @ query
+            alive = snapshot["alive"][rows]
+        
+        candidates = np.flatnonzero(alive)
+        if not len(candidates):
+            return []
+        
+        k = min(top_k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        
+        results = []
+        for i in top:
+            row = int(rows[i]) if rows is not None else int(i)
+            results.append({
+                "id": snapshot["ids"][row],
+                "score": float(scores[i]),
+                "text": snapshot["texts"][row],
+                "source": snapshot["sources"][row],
+                "category": snapshot["categories"][row]
+            })
+        
+        logger.info(f"Retrieved {len(results)} documents from local vector index")
+        return results
+    
+    def delete_documents(self, ids: List[str]):
+        self._require_initialized()
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._reload_if_changed()
+            rows = [self.id_to_row.pop(doc_id) for doc_id in dict.fromkeys(ids) if doc_id in self.id_to_row]
+            if not rows:
+                return
+            
+            self._append(np.zeros((0, self.dimension), dtype=np.float32), [], rows)
+            self._extend_snapshot([], rows)
+            self._maintain()
+        
+        logger.info(f"Deleted {len(rows)} documents from local vector index")
+    
+    def delete_all(self):
+        self._require_initialized()
+        
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            for name in os.listdir(self.path):
+                if name != LOCK_FILE:
+                    os.remove(os.path.join(self.path, name))
+            self._load()
+        
+        logger.info("Deleted all vectors from local vector index")
+    
+    def get_stats(self) -> Dict:
+        self._require_initialized()
+        self._refresh()
+        
+        snapshot = self._snapshot
+        categories = {category: int(snapshot["alive"][rows].sum()) for category, rows in snapshot["partitions"].items()}
+        return {
+            "total_vector_count": int(snapshot["alive"].sum()),
+            "dimension": self.dimension,
+            "index_fullness": 0.0,
+            "stored_rows": snapshot["count"],
+            "categories": {category: count for category, count in categories.items() if count}
+        }
+    
+    def _maintain(self):
+        count = self.meta["count"]
+        dead = count - len(self.id_to_row)
+        
+        if dead and dead >= COMPACT_DEAD_FRACTION * count:
+            self._rewrite()
+    
+    def _rewrite(self):
+        snapshot = self._snapshot
+        live = np.flatnonzero(snapshot["alive"])
+        live = np.array(sorted(live, key=lambda row: (snapshot["categories"][row], snapshot["ids"][row])), dtype=np.int64)
+        generation = self.meta["generation"] + 1
+        
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(VECTORS_FILE, generation), "wb") as f:
+            for start in range(0, len(live), REWRITE_CHUNK_SIZE):
+                np.asarray(snapshot["matrix"][live[start:start + REWRITE_CHUNK_SIZE]]).tofile(f)
+            self._sync(f)
+        
+        with open(self._file(RECORDS_FILE, generation), "wb") as f:
+            records = b"".join(
+                self._encode_record([
+                    snapshot["ids"][row], snapshot["texts"][row], snapshot["sources"][row], snapshot["categories"][row]
+                ])
+                for row in live
+            )
+            f.write(records)
+            self._sync(f)
+        open(self._file(TOMBSTONES_FILE, generation), "wb").close()
+        
+        previous = self.meta["generation"]
+        self._commit({
+            **self.meta,
+            "generation": generation,
+            "count": len(live),
+            "records_bytes": len(records),
+            "tombstones": 0
+        })
+        self._remove_generation(previous)
+        self._load()
+        
+        logger.info(f"Compacted local vector index: {len(live)} live of {snapshot['count']} stored rows")
+    
+    def _append(self, vectors: np.ndarray, records: List[list], tombstones: List[int]):
+        os.makedirs(self.path, exist_ok=True)
+        generation = self.meta["generation"]
+        
+        with open(self._file(VECTORS_FILE, generation), "ab") as f:
+            f.truncate(self.meta["count"] * self.dimension * np.dtype(np.float32).itemsize)
+            vectors.astype(np.float32).tofile(f)
+            self._sync(f)
+        
+        encoded = b"".join(self._encode_record(record) for record in records)
+        with open(self._file(RECORDS_FILE, generation), "ab") as f:
+            f.truncate(self.meta["records_bytes"])
+            f.write(encoded)
+            self._sync(f)
+        
+        with open(self._file(TOMBSTONES_FILE, generation), "ab") as f:
+            f.truncate(self.meta["tombstones"] * 8)
+            np.asarray(tombstones, dtype=np.int64).tofile(f)
+            self._sync(f)
+        
+        self._commit({
+            **self.meta,
+            "count": self.meta["count"] + len(records),
+            "records_bytes": self.meta["records_bytes"] + len(encoded),
+            "tombstones": self.meta["tombstones"] + len(tombstones)
+        })
+    
+    def _commit(self, meta: Dict):
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+            self._sync(f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self.meta = meta
+        self._meta_version = self._stat_meta()
+    
+    def _extend_snapshot(self, records: List[list], dead_rows: List[int]):
+        snapshot = self._snapshot
+        start = snapshot["count"]
+        count = self.meta["count"]
+        
+        partitions = snapshot["partitions"]
+        if records:
+            added: Dict[str, List[int]] = {}
+            for offset, (doc_id, text, source, category) in enumerate(records):
+                snapshot["ids"].append(doc_id)
+                snapshot["texts"].append(text)
+                snapshot["sources"].append(source)
+                snapshot["categories"].append(category)
+                added.setdefault(category, []).append(start + offset)
+            
+            partitions = dict(partitions)
+            for category, rows in added.items():
+                previous = partitions.get(category, np.zeros(0, dtype=np.int64))
+                partitions[category] = np.concatenate([previous, np.asarray(rows, dtype=np.int64)])
+        
+        if count > len(self._alive_buffer):
+            buffer = np.zeros(max(count, 2 * len(self._alive_buffer)), dtype=bool)
+            buffer[:start] = self._alive_buffer[:start]
+            self._alive_buffer = buffer
+        self._alive_buffer[start:count] = True
+        self._alive_buffer[dead_rows] = False
+        
+        self._snapshot = {
+            **snapshot,
+            "matrix": self._open_vectors(self.meta["generation"], count),
+            "count": count,
+            "alive": self._alive_buffer[:count],
+            "partitions": partitions
+        }
+    
+    def _load(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        meta_version = self._stat_meta()
+        meta = {
+            "version": FORMAT_VERSION,
+            "dimension": self.dimension,
+            "generation": 0,
+            "count": 0,
+            "records_bytes": 0,
+            "tombstones": 0
+        }
+        
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            
+            if meta.get("version") != FORMAT_VERSION:
+                raise RuntimeError(
+                    f"Local vector index at {self.path} uses an unsupported format, delete it and re-index"
+                )
+            if meta["dimension"] != self.dimension:
+                raise RuntimeError(
+                    f"Local vector index at {self.path} has dimension {meta['dimension']}, expected {self.dimension}"
+                )
+        
+        generation = meta["generation"]
+        count = meta["count"]
+        
+        ids, texts, sources, categories = [], [], [], []
+        grouped: Dict[str, List[int]] = {}
+        if count:
+            with open(self._file(RECORDS_FILE, generation), "rb") as f:
+                data = f.read(meta["records_bytes"])
+            for row, line in enumerate(data.splitlines()):
+                doc_id, text, source, category = json.loads(line)
+                ids.append(doc_id)
+                texts.append(text)
+                sources.append(source)
+                categories.append(category)
+                grouped.setdefault(category, []).append(row)
+        
+        self._alive_buffer = np.ones(count, dtype=bool)
+        if meta["tombstones"]:
+            tombstones = np.fromfile(self._file(TOMBSTONES_FILE, generation), dtype=np.int64, count=meta["tombstones"])
+            self._alive_buffer[tombstones] = False
+        
+        self.meta = meta
+        self._meta_version = meta_version
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(ids) if self._alive_buffer[row]}
+        self._snapshot = {
+            "matrix": self._open_vectors(generation, count),
+            "count": count,
+            "ids": ids,
+            "texts": texts,
+            "sources": sources,
+            "categories": categories,
+            "alive": self._alive_buffer[:count],
+            "partitions": {category: np.asarray(rows, dtype=np.int64) for category, rows in grouped.items()}
+        }
+    
+    def _open_vectors(self, generation: int, count: int) -> np.ndarray:
+        if not count:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.memmap(self._file(VECTORS_FILE, generation), dtype=np.float32, mode="r", shape=(count, self.dimension))
+    
+    def _remove_generation(self, generation: int):
+        for name in (VECTORS_FILE, RECORDS_FILE, TOMBSTONES_FILE):
+            path = self._file(name, generation)
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _file(self, name: str, generation: int) -> str:
+        extension = "f32" if name == VECTORS_FILE else "bin"
+        return os.path.join(self.path, f"{name}.{generation}.{extension}")
+    
+    def _refresh(self):
+        if self._stat_meta() == self._meta_version:
+            return
+        
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._reload_if_changed()
+    
+    def _reload_if_changed(self):
+        if self._stat_meta() != self._meta_version:
+            self._load()
+            logger.info(f"Reloaded {len(self.id_to_row)} vectors changed by another process in {self.path}")
+    
+    def _stat_meta(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    @contextmanager
+    def _file_lock(self, operation: int):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _require_initialized(self):
+        if self.dimension is None:
+            raise RuntimeError("Index not initialized. Call initialize_index() first")
+    
+    @staticmethod
+    def _encode_record(record: list) -> bytes:
+        return json.dumps(record).encode("utf-8") + b"\n"
+    
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+    
+    @staticmethod
+    def _category_filter(filter: Optional[Dict]) -> Optional[str]:
+        if not filter or "category" not in filter:
+            return None
+        
+        condition = filter["category"]
+        if isinstance(condition, dict):
+            return condition.get("$eq")
+        return condition
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,139 @@
+from app.config import settings
+from typing import Dict, List, Optional, Union
+import numpy as np
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+SPECIAL_TOKENS_FILE = "special_tokens_map.json"
+MAX_SEQUENCE_LENGTH = 256
+
+
+class OnnxEmbeddingEngine:
+    
+    def __init__(self, model_name: str, path: Optional[str] = None, threads: int = 0):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_ENGINE=onnx requires onnxruntime and tokenizers, install them or use EMBEDDING_ENGINE=pytorch"
+            ) from e
+        
+        hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        model_dir = os.path.join(path or settings.embedding_onnx_path, hub_name.replace("/", "__"))
+        quantized_dir = os.path.join(model_dir, "int8")
+        
+        if not os.path.exists(os.path.join(quantized_dir, QUANTIZED_FILE)):
+            self._export(hub_name, model_dir, quantized_dir)
+        
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads or os.cpu_count() or 1
+        session_options.inter_op_num_threads = 1
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(quantized_dir, QUANTIZED_FILE),
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(quantized_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        pad_token = self._pad_token(quantized_dir)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        
+        logger.info(f"Loaded int8 ONNX embedding model with {session_options.intra_op_num_threads} threads")
+    
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch(batch)
+            
+            inputs = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+            }
+            
+            hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            embeddings[start:start + len(batch)] = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        
+        return embeddings[0] if single else embeddings
+    
+    @staticmethod
+    def _export(hub_name: str, model_dir: str, quantized_dir: str):
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                f"No exported ONNX model in {quantized_dir}, exporting one requires optimum[onnxruntime]"
+            ) from e
+        
+        logger.info(f"Exporting {hub_name} to ONNX and quantizing to int8 in {quantized_dir}")
+        
+        exported = ORTModelForFeatureExtraction.from_pretrained(hub_name, export=True)
+        exported.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(hub_name).save_pretrained(quantized_dir)
+        
+        quantizer = ORTQuantizer.from_pretrained(model_dir)
+        quantizer.quantize(
+            save_dir=quantized_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        )
+    
+    @staticmethod
+    def _pad_token(model_dir: str) -> str:
+        with open(os.path.join(model_dir, SPECIAL_TOKENS_FILE)) as f:
+            pad_token = json.load(f).get("pad_token", "[PAD]")
+        return pad_token["content"] if isinstance(pad_token, dict) else pad_token
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+def check_parity(reference, candidate, texts: List[str]) -> Dict:
+    expected = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosine = (expected * actual).sum(axis=1)
+    
+    return {
+        "texts": len(texts),
+        "min_cosine": round(float(cosine.min()), 4),
+        "mean_cosine": round(float(cosine.mean()), 4)
+    }
+
+
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+    
+    logging.basicConfig(level="INFO")
+    
+    corpus_path = os.path.join(os.path.dirname(__file__), "..", "..", "tests", "fixtures", "embedding_corpus.txt")
+    with open(corpus_path) as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    
+    report = check_parity(
+        SentenceTransformer("all-MiniLM-L6-v2"),
+        OnnxEmbeddingEngine("all-MiniLM-L6-v2", threads=settings.embedding_onnx_threads),
+        corpus
+    )
+    print(json.dumps(report, indent=2))
@@ -1,17 +1,52 @@
 from pinecone import Pinecone, ServerlessSpec
+from app.kb.doc_store import DocumentStore
 from app.config import settings
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Iterator
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+UPSERT_MAX_VECTORS = 100
+UPSERT_MAX_BYTES = 2 * 1024 * 1024
+DELETE_BATCH_SIZE = 1000
+VALUE_BYTES_ESTIMATE = 12
+
+
+def estimate_upsert_bytes(doc: Dict) -> int:
+    metadata = len(doc["text"].encode("utf-8")) + len(doc.get("source", "")) + len(doc.get("category", ""))
+    return len(doc["id"]) + len(doc["embedding"]) * VALUE_BYTES_ESTIMATE + metadata + 64
+
+
+def iter_upsert_chunks(
+    documents: List[Dict],
+    max_vectors: int = UPSERT_MAX_VECTORS,
+    max_bytes: int = UPSERT_MAX_BYTES
+) -> Iterator[List[Dict]]:
+    chunk = []
+    chunk_bytes = 0
+    
+    for doc in documents:
+        doc_bytes = estimate_upsert_bytes(doc)
+        if chunk and (len(chunk) >= max_vectors or chunk_bytes + doc_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        
+        chunk.append(doc)
+        chunk_bytes += doc_bytes
+    
+    if chunk:
+        yield chunk
+
 
 class PineconeClient:
     
-    def __init__(self):
+    def __init__(self, doc_store: Optional[DocumentStore] = None):
         self.pc = Pinecone(api_key=settings.pinecone_api_key)
         self.index_name = settings.pinecone_index_name
         self.index = None
+        self.doc_store = doc_store
         
     def initialize_index(self, dimension: int, metric: str = "cosine"):
         try:
@@ -43,20 +78,28 @@ class PineconeClient:
             raise RuntimeError("Index not initialized. Call initialize_index() first")
         
         try:
-            vectors = []
-            for doc in documents:
-                vectors.append({
-                    "id": doc["id"],
-                    "values": doc["embedding"],
-                    "metadata": {
-                        "text": doc["text"],
+            for chunk in iter_upsert_chunks(documents):
+                if self.doc_store:
+                    self.doc_store.set_many(chunk)
+                
+                vectors = []
+                for doc in chunk:
+                    metadata = {
                         "source": doc.get("source", "unknown"),
                         "category": doc.get("category", "general")
                     }
-                })
+                    if not self.doc_store:
+                        metadata["text"] = doc["text"]
+                    
+                    vectors.append({
+                        "id": doc["id"],
+                        "values": np.asarray(doc["embedding"], dtype=np.float32).tolist(),
+                        "metadata": metadata
+                    })
+                
+                self.index.upsert(vectors=vectors)
             
-            self.index.upsert(vectors=vectors)
-            logger.info(f"Upserted {len(vectors)} documents to Pinecone")
+            logger.info(f"Upserted {len(documents)} documents to Pinecone")
             
         except Exception as e:
             logger.error(f"Failed to upsert documents: {e}")
@@ -64,7 +107,7 @@ class PineconeClient:
     
     def query(
         self, 
-        query_embedding: List[float], 
+        query_embedding: Union[np.ndarray, List[float]], 
         top_k: int = 5,
         filter: Optional[Dict] = None
     ) -> List[Dict]:
@@ -73,7 +116,7 @@ class PineconeClient:
         
         try:
             response = self.index.query(
-                vector=query_embedding,
+                vector=np.asarray(query_embedding, dtype=np.float32).tolist(),
                 top_k=top_k,
                 include_metadata=True,
                 filter=filter
@@ -84,7 +127,7 @@ class PineconeClient:
                 results.append({
                     "id": match.id,
                     "score": match.score,
-                    "text": match.metadata.get("text", ""),
+                    "text": match.metadata.get("text"),
                     "source": match.metadata.get("source", "unknown"),
                     "category": match.metadata.get("category", "general")
                 })
@@ -96,12 +139,28 @@ class PineconeClient:
             logger.error(f"Failed to query Pinecone: {e}")
             raise
     
+    def delete_documents(self, ids: List[str]):
+        if not self.index:
+            raise RuntimeError("Index not initialized. Call initialize_index() first")
+        
+        try:
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                self.index.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+            if self.doc_store:
+                self.doc_store.delete_many(ids)
+            logger.info(f"Deleted {len(ids)} vectors from index")
+        except Exception as e:
+            logger.error(f"Failed to delete vectors: {e}")
+            raise
+    
     def delete_all(self):
         if not self.index:
             raise RuntimeError("Index not initialized. Call initialize_index() first")
         
         try:
             self.index.delete(delete_all=True)
+            if self.doc_store:
+                self.doc_store.delete_all()
             logger.info("Deleted all vectors from index")
         except Exception as e:
             logger.error(f"Failed to delete vectors: {e}")
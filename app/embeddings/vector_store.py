@@ -0,0 +1,28 @@
+from app.embeddings.pinecone_client import PineconeClient
+from app.embeddings.local_index import LocalVectorIndex
+from app.embeddings.ivf_index import IVFVectorIndex
+from app.kb.doc_store import DocumentStore
+from app.config import settings
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def create_document_store() -> Optional[DocumentStore]:
+    if settings.kb_backend != "pinecone" or not settings.kb_doc_store_enabled:
+        return None
+    return DocumentStore(
+        max_entries=settings.kb_doc_store_max_entries,
+        ttl_seconds=settings.kb_doc_store_ttl_seconds
+    )
+
+
+def create_vector_store(doc_store: Optional[DocumentStore] = None, path: Optional[str] = None):
+    logger.info(f"Using {settings.kb_backend} knowledge base backend")
+    
+    if settings.kb_backend == "local" and settings.kb_index_type == "ivf":
+        return IVFVectorIndex(path or settings.kb_path)
+    if settings.kb_backend == "local":
+        return LocalVectorIndex(path or settings.kb_path)
+    return PineconeClient(doc_store=doc_store)
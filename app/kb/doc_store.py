@@ -0,0 +1,130 @@
+from app.cache.lru import TTLCache
+from app.db.session import get_db_context
+from app.db.models import KBDocumentText
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH_SIZE = 500
+
+
+class DocumentStore:
+    
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "db_lookups": 0,
+            "db_errors": 0,
+            "writes": 0
+        }
+    
+    def get_many(self, doc_ids: List[str]) -> Dict[str, str]:
+        found = {}
+        for doc_id in doc_ids:
+            text = self.memory.get(doc_id)
+            if text is not None:
+                found[doc_id] = text
+        
+        memory_hits = len(found)
+        missing = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id not in found]
+        
+        if missing:
+            loaded = self._load_from_db(missing)
+            for doc_id, text in loaded.items():
+                self.memory.set(doc_id, text)
+            found.update(loaded)
+        
+        with self._lock:
+            self._stats["memory_hits"] += memory_hits
+            self._stats["db_hits"] += len(found) - memory_hits
+            self._stats["misses"] += len(missing) - (len(found) - memory_hits)
+        
+        return found
+    
+    def set_many(self, documents: List[Dict]):
+        if not documents:
+            return
+        
+        now = datetime.utcnow()
+        rows = {
+            doc["id"]: {
+                "doc_id": doc["id"],
+                "text": doc["text"],
+                "source": doc.get("source", "unknown"),
+                "category": doc.get("category", "general"),
+                "updated_at": now
+            }
+            for doc in documents
+        }
+        
+        statement = insert(KBDocumentText).values(list(rows.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[KBDocumentText.doc_id],
+            set_={
+                "text": statement.excluded.text,
+                "source": statement.excluded.source,
+                "category": statement.excluded.category,
+                "updated_at": statement.excluded.updated_at
+            }
+        )
+        
+        with get_db_context() as db:
+            db.execute(statement)
+        
+        for doc_id, row in rows.items():
+            self.memory.set(doc_id, row["text"])
+        
+        with self._lock:
+            self._stats["writes"] += len(rows)
+    
+    def delete_many(self, doc_ids: List[str]):
+        for start in range(0, len(doc_ids), LOOKUP_BATCH_SIZE):
+            batch = doc_ids[start:start + LOOKUP_BATCH_SIZE]
+            with get_db_context() as db:
+                db.execute(delete(KBDocumentText).where(KBDocumentText.doc_id.in_(batch)))
+            for doc_id in batch:
+                self.memory.delete(doc_id)
+    
+    def delete_all(self):
+        with get_db_context() as db:
+            db.execute(delete(KBDocumentText))
+        self.memory.clear()
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+    
+    def _load_from_db(self, doc_ids: List[str]) -> Dict[str, str]:
+        with self._lock:
+            self._stats["db_lookups"] += 1
+        
+        try:
+            loaded = {}
+            with get_db_context() as db:
+                for start in range(0, len(doc_ids), LOOKUP_BATCH_SIZE):
+                    batch = doc_ids[start:start + LOOKUP_BATCH_SIZE]
+                    rows = db.execute(
+                        select(KBDocumentText.doc_id, KBDocumentText.text).where(KBDocumentText.doc_id.in_(batch))
+                    )
+                    loaded.update({doc_id: text for doc_id, text in rows})
+            return loaded
+        
+        except Exception as e:
+            logger.warning(f"KB document lookup failed: {e}")
+            with self._lock:
+                self._stats["db_errors"] += 1
+            return {}
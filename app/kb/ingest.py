@@ -0,0 +1,285 @@
+from app.embeddings.pinecone_client import iter_upsert_chunks
+from app.embeddings.vector_store import create_vector_store, create_document_store
+from app.embeddings.embed import embedding_model_id
+from app.kb.manifest import KBManifest, MANIFEST_FILE, chunk_document, content_hash
+from app.config import settings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set
+import numpy as np
+import argparse
+import json
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = (".md", ".txt", ".jsonl")
+INDEX_DIRS = {"index", "ivf_index"}
+CHECKPOINT_FILE = ".ingest_checkpoint"
+PROGRESS_INTERVAL_SECONDS = 10.0
+
+_worker_generator = None
+
+
+def iter_documents(kb_path: str) -> Iterator[Dict]:
+    for root, dirs, files in os.walk(kb_path):
+        dirs[:] = sorted(d for d in dirs if d not in INDEX_DIRS and not d.startswith("."))
+        
+        for name in sorted(files):
+            if name.startswith(".") or not name.endswith(DOCUMENT_EXTENSIONS):
+                continue
+            
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, kb_path).replace(os.sep, "/")
+            category = relpath.split("/")[0] if "/" in relpath else "general"
+            
+            if name.endswith(".jsonl"):
+                yield from _iter_jsonl(path, relpath, category)
+                continue
+            
+            with open(path, encoding="utf-8") as f:
+                text = f.read().strip()
+            if text:
+                yield {"id": relpath, "text": text, "source": relpath, "category": category}
+
+
+def _iter_jsonl(path: str, relpath: str, category: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping {relpath}:{lineno}: {e}")
+                continue
+            
+            text = str(record.get("text", "")).strip()
+            if not text:
+                logger.warning(f"Skipping {relpath}:{lineno}: no text")
+                continue
+            
+            yield {
+                "id": str(record.get("id", f"{relpath}:{lineno}")),
+                "text": text,
+                "source": record.get("source", relpath),
+                "category": record.get("category", category)
+            }
+
+
+def _init_worker():
+    global _worker_generator
+    from app.embeddings.embed import EmbeddingGenerator
+    _worker_generator = EmbeddingGenerator()
+
+
+def _embed_texts(texts: List[str]) -> np.ndarray:
+    return _worker_generator.embed_batch(texts)
+
+
+class Checkpoint:
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def load(self) -> Set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        
+        with open(self.path, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.endswith("\n")}
+    
+    def record(self, doc_ids: List[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{doc_id}\n" for doc_id in doc_ids))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class KnowledgeBaseIngestor:
+    
+    def __init__(
+        self,
+        kb_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        chunk_max_chars: Optional[int] = None
+    ):
+        self.kb_path = kb_path or settings.kb_path
+        self.batch_size = max(batch_size or settings.kb_ingest_batch_size, 1)
+        self.workers = max(workers or settings.kb_ingest_workers, 1)
+        self.concurrency = max(concurrency or settings.kb_ingest_concurrency, 1)
+        self.chunk_max_chars = max(chunk_max_chars or settings.kb_chunk_max_chars, 1)
+        self.checkpoint = Checkpoint(os.path.join(self.kb_path, CHECKPOINT_FILE))
+        self.manifest = KBManifest(os.path.join(self.kb_path, MANIFEST_FILE), model=embedding_model_id())
+        self.vector_store = None
+        self.dimension: Optional[int] = None
+        self._documents: Dict[str, Dict] = {}
+        self._removed: Set[str] = set()
+        self._stats = {"documents": 0, "unchanged": 0, "indexed": 0, "deleted": 0, "skipped": 0, "upserts": 0}
+    
+    def run(self, restart: bool = False, full: bool = False) -> Dict:
+        if restart:
+            self.checkpoint.clear()
+        completed = self.checkpoint.load()
+        if completed:
+            logger.info(f"Resuming ingestion, {len(completed)} chunks already indexed")
+        
+        self.manifest.load()
+        self.dimension = self.manifest.dimension
+        
+        started = time.perf_counter()
+        last_progress = started
+        embedding: deque = deque()
+        upserting = set()
+        
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as embed_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as upsert_pool:
+            
+            for batch in self._iter_batches(completed, full):
+                embedding.append((batch, embed_pool.submit(_embed_texts, [doc["text"] for doc in batch])))
+                
+                while embedding and embedding[0][1].done() and len(upserting) < self.concurrency * 2:
+                    upserting |= self._submit_upserts(upsert_pool, *embedding.popleft())
+                
+                while len(embedding) >= self.workers * 2 or len(upserting) >= self.concurrency * 2:
+                    if len(embedding) >= self.workers * 2 and len(upserting) < self.concurrency * 2:
+                        upserting |= self._submit_upserts(upsert_pool, *embedding.popleft())
+                    else:
+                        upserting = self._collect(upserting, FIRST_COMPLETED)
+                
+                if time.perf_counter() - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    self._log_progress(started)
+                    last_progress = time.perf_counter()
+            
+            while embedding:
+                upserting |= self._submit_upserts(upsert_pool, *embedding.popleft())
+            self._collect(upserting)
+        
+        for doc_id, entry in self.manifest.documents.items():
+            if doc_id not in self._documents:
+                self._removed.update(entry["chunks"])
+        
+        if self._removed:
+            self._get_vector_store().delete_documents(sorted(self._removed))
+            self._stats["deleted"] = len(self._removed)
+        
+        self.manifest.save(self._documents, self.dimension)
+        self.checkpoint.clear()
+        
+        elapsed = time.perf_counter() - started
+        summary = {
+            **self._stats,
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_second": round(self._stats["documents"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_second": round(self._stats["indexed"] / elapsed, 2) if elapsed else 0.0
+        }
+        logger.info(
+            f"Processed {summary['documents']} documents in {summary['elapsed_seconds']}s "
+            f"({summary['docs_per_second']} docs/sec): {summary['unchanged']} unchanged, "
+            f"{summary['indexed']} chunks indexed, {summary['deleted']} deleted, {summary['skipped']} skipped"
+        )
+        return summary
+    
+    def _iter_batches(self, completed: Set[str], full: bool) -> Iterator[List[Dict]]:
+        batch = []
+        for doc in iter_documents(self.kb_path):
+            if doc["id"] in self._documents:
+                logger.warning(f"Skipping duplicate document id {doc['id']}")
+                continue
+            
+            self._stats["documents"] += 1
+            doc_hash = content_hash(doc["source"], doc["category"], doc["text"])
+            chunks = chunk_document(doc, self.chunk_max_chars)
+            self._documents[doc["id"]] = {"hash": doc_hash, "chunks": [chunk["id"] for chunk in chunks]}
+            
+            changed, removed = self.manifest.diff(doc["id"], doc_hash, chunks, full=full)
+            self._removed |= removed
+            if not changed:
+                self._stats["unchanged"] += 1
+            
+            for chunk in changed:
+                if chunk["id"] in completed:
+                    self._stats["skipped"] += 1
+                    continue
+                
+                batch.append(chunk)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        
+        if batch:
+            yield batch
+    
+    def _submit_upserts(self, upsert_pool: ThreadPoolExecutor, batch: List[Dict], future) -> Set:
+        embeddings = future.result()
+        self.dimension = embeddings.shape[1]
+        vector_store = self._get_vector_store()
+        
+        indexed_docs = [{**doc, "embedding": embeddings[i]} for i, doc in enumerate(batch)]
+        
+        futures = set()
+        for chunk in iter_upsert_chunks(indexed_docs):
+            upsert = upsert_pool.submit(vector_store.upsert_documents, chunk)
+            upsert.doc_ids = [doc["id"] for doc in chunk]
+            futures.add(upsert)
+        return futures
+    
+    def _collect(self, futures: Set, return_when: str = ALL_COMPLETED) -> Set:
+        done, pending = wait(futures, return_when=return_when)
+        
+        for future in done:
+            future.result()
+            self.checkpoint.record(future.doc_ids)
+            self._stats["indexed"] += len(future.doc_ids)
+            self._stats["upserts"] += 1
+        
+        return pending
+    
+    def _get_vector_store(self):
+        if self.vector_store is None:
+            self.vector_store = create_vector_store(doc_store=create_document_store(), path=self.kb_path)
+            self.vector_store.initialize_index(dimension=self.dimension)
+        return self.vector_store
+    
+    def _log_progress(self, started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Processed {self._stats['documents']} documents ({self._stats['documents'] / elapsed:.1f} docs/sec), "
+            f"{self._stats['indexed']} chunks indexed, {self._stats['unchanged']} unchanged"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest knowledge base documents into the vector store")
+    parser.add_argument("--path", default=settings.kb_path, help="Directory of .md, .txt and .jsonl documents")
+    parser.add_argument("--batch-size", type=int, default=settings.kb_ingest_batch_size, help="Documents per embedding batch")
+    parser.add_argument("--workers", type=int, default=settings.kb_ingest_workers, help="Embedding worker processes")
+    parser.add_argument("--concurrency", type=int, default=settings.kb_ingest_concurrency, help="Upsert requests in flight")
+    parser.add_argument("--chunk-size", type=int, default=settings.kb_chunk_max_chars, help="Maximum characters per chunk")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    parser.add_argument("--full", action="store_true", help="Re-embed every chunk instead of only new or changed ones")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=settings.log_level)
+    
+    ingestor = KnowledgeBaseIngestor(
+        kb_path=args.path,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        chunk_max_chars=args.chunk_size
+    )
+    print(json.dumps(ingestor.run(restart=args.restart, full=args.full), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import json
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = ".kb_manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_ID_HASH_CHARS = 12
+
+
+def content_hash(*parts: str) -> str:
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            pieces.append(paragraph)
+    
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(doc: Dict, max_chars: int) -> List[Dict]:
+    chunks = []
+    seen: Dict[str, int] = {}
+    
+    for text in split_text(doc["text"], max_chars):
+        digest = content_hash(doc["source"], doc["category"], text)[:CHUNK_ID_HASH_CHARS]
+        seen[digest] = seen.get(digest, 0) + 1
+        suffix = f"-{seen[digest]}" if seen[digest] > 1 else ""
+        
+        chunks.append({
+            "id": f"{doc['id']}#{digest}{suffix}",
+            "text": text,
+            "source": doc["source"],
+            "category": doc["category"]
+        })
+    
+    return chunks
+
+
+class KBManifest:
+    
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self.dimension: Optional[int] = None
+        self.documents: Dict[str, Dict] = {}
+        self.model_changed = False
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            logger.info(f"No KB manifest at {self.path}, every document will be indexed")
+            return
+        
+        with open(self.path) as f:
+            manifest = json.load(f)
+        
+        if manifest.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring KB manifest at {self.path} with version {manifest.get('version')}")
+            return
+        
+        self.documents = manifest["documents"]
+        self.dimension = manifest.get("dimension")
+        
+        if manifest["model"] != self.model:
+            logger.warning(f"KB manifest was built with {manifest['model']}, re-embedding every chunk with {self.model}")
+            self.model_changed = True
+        
+        logger.info(f"Loaded KB manifest with {len(self.documents)} documents")
+    
+    def diff(self, doc_id: str, doc_hash: str, chunks: List[Dict], full: bool = False) -> Tuple[List[Dict], Set[str]]:
+        entry = self.documents.get(doc_id)
+        if entry is None:
+            return chunks, set()
+        
+        previous = set(entry["chunks"])
+        current = {chunk["id"] for chunk in chunks}
+        
+        if full or self.model_changed:
+            return chunks, previous - current
+        if entry["hash"] == doc_hash:
+            return [], set()
+        return [chunk for chunk in chunks if chunk["id"] not in previous], previous - current
+    
+    def save(self, documents: Dict[str, Dict], dimension: Optional[int]):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "model": self.model,
+                "dimension": dimension,
+                "documents": documents
+            }, f)
+        os.replace(self.path + ".tmp", self.path)
+        
+        self.documents = documents
+        self.dimension = dimension
+        self.model_changed = False
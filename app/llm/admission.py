@@ -0,0 +1,137 @@
+from app.metrics import LatencyHistogram
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_RANKS = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+
+EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"LLM admission rejected: {reason}")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    
+    def __init__(
+        self,
+        capacity: Callable[[], int],
+        deadline_seconds: float,
+        initial_service_seconds: float
+    ):
+        self._capacity = capacity
+        self.deadline_seconds = deadline_seconds
+        self.service_ewma = initial_service_seconds
+        
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        
+        self.wait_time = LatencyHistogram()
+        self.service_time = LatencyHistogram()
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "max_queue_depth": 0
+        }
+    
+    @asynccontextmanager
+    async def admit(self, priority: str, deadline_seconds: Optional[float] = None) -> AsyncIterator[None]:
+        rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS["medium"])
+        deadline = deadline_seconds or self.deadline_seconds
+        start = time.monotonic()
+        
+        if self._active < self.capacity and not self.queue_depth:
+            self._active += 1
+        else:
+            await self._wait_for_slot(rank, deadline)
+        
+        admitted_at = time.monotonic()
+        self.wait_time.observe(admitted_at - start)
+        self._stats["admitted"] += 1
+        
+        try:
+            yield
+        finally:
+            service_seconds = time.monotonic() - admitted_at
+            self.service_time.observe(service_seconds)
+            self.service_ewma = EWMA_ALPHA * service_seconds + (1 - EWMA_ALPHA) * self.service_ewma
+            self._release()
+    
+    @property
+    def capacity(self) -> int:
+        return max(self._capacity(), 1)
+    
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+    
+    def check(self, priority: str, deadline_seconds: Optional[float] = None):
+        if self._active < self.capacity and not self.queue_depth:
+            return
+        
+        rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS["medium"])
+        self._reject_if_late(rank, deadline_seconds or self.deadline_seconds)
+    
+    def estimate_wait(self, rank: int) -> float:
+        ahead = sum(1 for waiter_rank, _, future in self._waiters if waiter_rank <= rank and not future.done())
+        return (ahead + 1) / self.capacity * self.service_ewma
+    
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["active"] = self._active
+        stats["capacity"] = self.capacity
+        stats["queue_depth"] = self.queue_depth
+        stats["service_ewma_seconds"] = round(self.service_ewma, 4)
+        stats["wait_time"] = self.wait_time.snapshot()
+        stats["service_time"] = self.service_time.snapshot()
+        
+        return stats
+    
+    def _reject_if_late(self, rank: int, deadline: float):
+        estimated = self.estimate_wait(rank)
+        if estimated > deadline:
+            self._stats["rejected"] += 1
+            logger.warning(f"Rejecting LLM request: estimated queue wait {estimated:.1f}s exceeds {deadline:.1f}s deadline")
+            raise AdmissionRejected(retry_after=estimated, reason="estimated queue wait exceeds deadline")
+    
+    async def _wait_for_slot(self, rank: int, deadline: float):
+        self._reject_if_late(rank, deadline)
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._sequence), future))
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self.queue_depth)
+        
+        try:
+            done, _ = await asyncio.wait({future}, timeout=deadline)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+            raise
+        
+        if not done:
+            future.cancel()
+            self._stats["timed_out"] += 1
+            raise AdmissionRejected(retry_after=self.estimate_wait(rank), reason="queue wait exceeded deadline")
+    
+    def _release(self):
+        self._active -= 1
+        
+        while self._waiters and self._active < self.capacity:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
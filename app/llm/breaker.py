@@ -0,0 +1,154 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM circuit breaker is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    
+    def __init__(
+        self,
+        window_size: int,
+        min_calls: int,
+        failure_rate_threshold: float,
+        slow_call_seconds: float,
+        slow_call_rate_threshold: float,
+        open_seconds: float,
+        half_open_probes: int
+    ):
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "rejected": 0,
+            "opened": 0
+        }
+    
+    def before_call(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.open_seconds:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.open_seconds - elapsed)
+                
+                self._transition(HALF_OPEN)
+            
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.open_seconds)
+                
+                self._probes_in_flight += 1
+                return True
+            
+            return False
+    
+    def raise_if_open(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == OPEN and elapsed < self.open_seconds:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(self.open_seconds - elapsed)
+    
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        probe = self.before_call()
+        start = time.monotonic()
+        outcome = None
+        
+        try:
+            yield
+            outcome = True
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            self._record(probe, outcome, time.monotonic() - start)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self.state
+            stats["window_failure_rate"] = self._rate(lambda ok, slow: not ok)
+            stats["window_slow_rate"] = self._rate(lambda ok, slow: slow)
+        return stats
+    
+    def _record(self, probe: bool, outcome, seconds: float):
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+            
+            if outcome is None:
+                return
+            
+            slow = outcome and seconds >= self.slow_call_seconds
+            self._stats["calls"] += 1
+            self._stats["failures"] += 0 if outcome else 1
+            self._stats["slow_calls"] += 1 if slow else 0
+            
+            if self.state == HALF_OPEN:
+                if not outcome or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED)
+                return
+            
+            self._outcomes.append((outcome, slow))
+            
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failure_rate = self._rate(lambda ok, slow: not ok)
+                slow_rate = self._rate(lambda ok, slow: slow)
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                    self._transition(OPEN)
+    
+    def _rate(self, predicate) -> float:
+        if not self._outcomes:
+            return 0.0
+        return round(sum(1 for ok, slow in self._outcomes if predicate(ok, slow)) / len(self._outcomes), 4)
+    
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        
+        logger.warning(f"LLM circuit breaker {self.state} -> {state}")
+        self.state = state
+        
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._stats["opened"] += 1
+        elif state == HALF_OPEN:
+            self._probe_successes = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
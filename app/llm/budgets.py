@@ -0,0 +1,127 @@
+from app.db.session import AsyncSessionLocal
+from app.db.models import Ticket, AgentDecisionLog, DraftedResponseLog
+from app.agents.context_packer import estimate_tokens
+from sqlalchemy import select, exists
+from typing import Dict, List, Optional
+from datetime import datetime
+import numpy as np
+import asyncio
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+STOP_SEQUENCES = [
+    "\nTicket Title:",
+    "\nTicket Description:",
+    "\nClassified Intent:",
+    "\n[Article ",
+    "\nRelevant knowledge base articles:"
+]
+
+REUSED_RESPONSE_ACTION = "reuse_cached_response"
+
+
+class GenerationBudgets:
+    
+    def __init__(
+        self,
+        default_tokens: int,
+        min_tokens: int,
+        percentile: float,
+        margin: float,
+        min_samples: int,
+        history_limit: int,
+        refresh_seconds: float
+    ):
+        self.default_tokens = default_tokens
+        self.min_tokens = min_tokens
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.history_limit = history_limit
+        self.refresh_seconds = refresh_seconds
+        
+        self.budgets: Dict[str, int] = {}
+        self.samples: Dict[str, int] = {}
+        self.refreshed_at: Optional[datetime] = None
+        self.refresh_errors = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def budget_for(self, intent: Optional[str]) -> int:
+        return self.budgets.get(intent, self.default_tokens)
+    
+    def stop_sequences(self) -> List[str]:
+        return list(STOP_SEQUENCES)
+    
+    def compute_budgets(self, history: List[tuple]) -> Dict[str, int]:
+        lengths: Dict[str, List[int]] = {}
+        for intent, draft_text in history:
+            if intent and draft_text:
+                lengths.setdefault(intent, []).append(estimate_tokens(draft_text))
+        
+        self.samples = {intent: len(values) for intent, values in lengths.items()}
+        
+        budgets = {}
+        for intent, values in lengths.items():
+            if len(values) < self.min_samples:
+                continue
+            
+            observed = float(np.percentile(values, self.percentile))
+            budget = math.ceil(observed * (1 + self.margin))
+            budgets[intent] = min(max(budget, self.min_tokens), self.default_tokens)
+        
+        return budgets
+    
+    async def refresh(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Ticket.intent, DraftedResponseLog.draft_text)
+                .join(Ticket, Ticket.id == DraftedResponseLog.ticket_id)
+                .where(DraftedResponseLog.confidence > 0)
+                .where(~exists().where(
+                    AgentDecisionLog.ticket_id == DraftedResponseLog.ticket_id,
+                    AgentDecisionLog.action == REUSED_RESPONSE_ACTION
+                ))
+                .order_by(DraftedResponseLog.created_at.desc())
+                .limit(self.history_limit)
+            )
+            history = result.all()
+        
+        self.budgets = self.compute_budgets(history)
+        self.refreshed_at = datetime.utcnow()
+        
+        logger.info(f"Refreshed generation budgets from {len(history)} drafts: {self.budgets}")
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict:
+        return {
+            "default_tokens": self.default_tokens,
+            "percentile": self.percentile,
+            "margin": self.margin,
+            "budgets": dict(self.budgets),
+            "samples": dict(self.samples),
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "refresh_errors": self.refresh_errors
+        }
+    
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.error(f"Generation budget refresh failed, keeping previous budgets: {e}")
+            await asyncio.sleep(self.refresh_seconds)
@@ -0,0 +1,84 @@
+from app.metrics import LatencyHistogram
+from app.schemas.response import KBDocument
+from typing import Dict, List, Optional, Sequence
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+
+
+class ModelCascade:
+    
+    def __init__(
+        self,
+        small_model: Optional[str],
+        large_model: str,
+        simple_intents: Sequence[str],
+        large_priorities: Sequence[str],
+        min_similarity: float,
+        escalation_threshold: float
+    ):
+        self.models = {SMALL_TIER: small_model, LARGE_TIER: large_model}
+        self.simple_intents = set(simple_intents)
+        self.large_priorities = set(large_priorities)
+        self.min_similarity = min_similarity
+        self.escalation_threshold = escalation_threshold
+        
+        self.latency = {SMALL_TIER: LatencyHistogram(), LARGE_TIER: LatencyHistogram()}
+        self.requests = {SMALL_TIER: 0, LARGE_TIER: 0}
+        self.escalations = 0
+        self._lock = threading.Lock()
+    
+    def choose_tier(self, intent: str, kb_documents: List[KBDocument], priority: str) -> str:
+        if not self.models[SMALL_TIER]:
+            return LARGE_TIER
+        
+        if priority in self.large_priorities or intent not in self.simple_intents:
+            return LARGE_TIER
+        
+        best_similarity = max((doc.similarity_score for doc in kb_documents), default=0.0)
+        if best_similarity < self.min_similarity:
+            return LARGE_TIER
+        
+        return SMALL_TIER
+    
+    def model_for(self, tier: str) -> str:
+        return self.models[tier]
+    
+    def should_escalate(self, tier: str, confidence: float) -> bool:
+        return tier == SMALL_TIER and confidence < self.escalation_threshold
+    
+    def record(self, tier: str, seconds: float):
+        self.latency[tier].observe(seconds)
+        with self._lock:
+            self.requests[tier] += 1
+    
+    def record_escalation(self, confidence: float):
+        with self._lock:
+            self.escalations += 1
+        
+        logger.info(
+            f"Escalating draft from {self.models[SMALL_TIER]} to {self.models[LARGE_TIER]} "
+            f"(confidence {confidence:.2f} < {self.escalation_threshold:.2f})"
+        )
+    
+    def get_stats(self) -> Dict:
+        small_requests = self.requests[SMALL_TIER]
+        
+        return {
+            "enabled": bool(self.models[SMALL_TIER]),
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / small_requests, 4) if small_requests else 0.0,
+            "escalation_threshold": self.escalation_threshold,
+            "tiers": {
+                tier: {
+                    "model": self.models[tier],
+                    "requests": self.requests[tier],
+                    "latency": self.latency[tier].snapshot()
+                }
+                for tier in (SMALL_TIER, LARGE_TIER)
+            }
+        }
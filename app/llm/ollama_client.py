@@ -0,0 +1,155 @@
+from app.config import settings
+from typing import AsyncIterator, Dict, Optional
+import httpx
+import asyncio
+import threading
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClient:
+    
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        
+        self.limits = httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive_connections,
+            keepalive_expiry=settings.ollama_keepalive_expiry_seconds
+        )
+        self.timeout = httpx.Timeout(
+            settings.ollama_read_timeout_seconds or settings.request_timeout_seconds,
+            connect=settings.ollama_connect_timeout_seconds
+        )
+        self.retries = settings.ollama_connect_retries
+        
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            transport=httpx.HTTPTransport(limits=self.limits, retries=self.retries)
+        )
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "errors": 0,
+            "timeouts": 0
+        }
+    
+    def generate(self, payload: Dict) -> Dict:
+        self._begin()
+        try:
+            response = self.client.post("/api/generate", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            self._record_error(e)
+            raise
+        finally:
+            self._end()
+    
+    async def agenerate(self, payload: Dict) -> Dict:
+        self._begin()
+        try:
+            response = await self._get_async_client().post("/api/generate", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            self._record_error(e)
+            raise
+        finally:
+            self._end()
+    
+    async def astream_generate(self, payload: Dict) -> AsyncIterator[Dict]:
+        self._begin()
+        try:
+            async with self._get_async_client().stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        except httpx.HTTPError as e:
+            self._record_error(e)
+            raise
+        finally:
+            self._end()
+    
+    async def aping(self, timeout: float) -> bool:
+        try:
+            response = await self._get_async_client().get("/api/tags", timeout=timeout)
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Ollama health check failed for {self.base_url}: {e}")
+            return False
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        
+        stats["base_url"] = self.base_url
+        stats["max_connections"] = self.limits.max_connections
+        stats["max_keepalive_connections"] = self.limits.max_keepalive_connections
+        stats["sync_pool"] = self._pool_stats(self.client)
+        stats["async_pool"] = self._pool_stats(self._async_client)
+        
+        return stats
+    
+    def close(self):
+        self.client.close()
+    
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None:
+                logger.warning(f"Event loop changed, recreating Ollama connection pool for {self.base_url}")
+            
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=httpx.AsyncHTTPTransport(limits=self.limits, retries=self.retries)
+            )
+            self._async_loop = loop
+        
+        return self._async_client
+    
+    def _begin(self):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+    
+    def _end(self):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+    
+    def _record_error(self, error: Exception):
+        with self._lock:
+            self._stats["errors"] += 1
+            if isinstance(error, httpx.TimeoutException):
+                self._stats["timeouts"] += 1
+    
+    @staticmethod
+    def _pool_stats(client) -> Optional[Dict]:
+        if client is None:
+            return None
+        
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        
+        return {
+            "connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle())
+        }
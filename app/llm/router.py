@@ -0,0 +1,300 @@
+from app.config import settings
+from app.llm.ollama_client import OllamaClient
+from app.metrics import LatencyHistogram
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+from contextlib import aclosing
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.2
+
+
+def model_load_seconds(result: Dict) -> float:
+    return result.get("load_duration", 0) / 1e9
+
+
+class OllamaBackend:
+    
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.client = OllamaClient(base_url)
+        self.latency = LatencyHistogram()
+        self.cold_latency = LatencyHistogram()
+        self.warm_latency = LatencyHistogram()
+        
+        self.in_flight = 0
+        self.cold_starts = 0
+        self.last_used = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ewma_latency: Optional[float] = None
+        self.ejected_until = 0.0
+        self.eject_reason: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+    
+    def acquire(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+    
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+    
+    def record_success(self, seconds: float, load_seconds: float = 0.0):
+        cold = load_seconds >= settings.ollama_cold_load_threshold_seconds
+        
+        self.latency.observe(seconds)
+        (self.cold_latency if cold else self.warm_latency).observe(seconds)
+        
+        with self._lock:
+            if cold:
+                self.cold_starts += 1
+            self.consecutive_failures = 0
+            if self.ewma_latency is None:
+                self.ewma_latency = seconds
+            else:
+                self.ewma_latency = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma_latency
+            
+            slow = self.ewma_latency > settings.ollama_slow_host_seconds
+        
+        if slow:
+            self.eject(f"slow (ewma latency {self.ewma_latency:.1f}s)")
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            failing = self.consecutive_failures >= settings.ollama_eject_after_failures
+        
+        if failing:
+            self.eject(f"{self.consecutive_failures} consecutive failures")
+    
+    def eject(self, reason: str):
+        with self._lock:
+            if not self.is_available():
+                return
+            self.ejected_until = time.monotonic() + settings.ollama_eject_seconds
+            self.eject_reason = reason
+        
+        logger.warning(f"Ejecting Ollama backend {self.base_url}: {reason}")
+    
+    def reinstate(self):
+        with self._lock:
+            self.ejected_until = 0.0
+            self.eject_reason = None
+            self.consecutive_failures = 0
+            self.ewma_latency = None
+        
+        logger.info(f"Reinstated Ollama backend {self.base_url}")
+    
+    def get_stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "available": self.is_available(),
+            "eject_reason": self.eject_reason,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency_seconds": round(self.ewma_latency, 4) if self.ewma_latency is not None else None,
+            "cold_starts": self.cold_starts,
+            "latency": self.latency.snapshot(),
+            "cold_latency": self.cold_latency.snapshot(),
+            "warm_latency": self.warm_latency.snapshot(),
+            "transport": self.client.get_stats()
+        }
+
+
+class OllamaRouter:
+    
+    def __init__(self, base_urls: Sequence[str]):
+        self.backends = [OllamaBackend(url) for url in base_urls]
+        self.first_token = LatencyHistogram()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._health_task: Optional[asyncio.Task] = None
+        
+        logger.info(f"Ollama router configured with {len(self.backends)} backend(s)")
+    
+    def select(self, exclude: Sequence[OllamaBackend] = ()) -> OllamaBackend:
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        available = [backend for backend in candidates if backend.is_available()]
+        
+        if not available:
+            if not candidates:
+                raise RuntimeError("No Ollama backends available")
+            logger.warning("All Ollama backends are ejected, routing to least loaded")
+            available = candidates
+        
+        return min(available, key=lambda backend: (backend.in_flight, backend.ewma_latency or 0.0))
+    
+    def available_count(self) -> int:
+        return sum(1 for backend in self.backends if backend.is_available())
+    
+    def generate(self, payload: Dict, backend: Optional[OllamaBackend] = None) -> Dict:
+        backend = backend or self.select()
+        backend.acquire()
+        start = time.monotonic()
+        
+        try:
+            result = backend.client.generate(payload)
+            backend.record_success(time.monotonic() - start, model_load_seconds(result))
+            return result
+        except Exception:
+            backend.record_failure()
+            raise
+        finally:
+            backend.release()
+    
+    async def agenerate(self, payload: Dict, backend: Optional[OllamaBackend] = None) -> Dict:
+        backend = backend or self.select()
+        backend.acquire()
+        start = time.monotonic()
+        
+        try:
+            result = await backend.client.agenerate(payload)
+            backend.record_success(time.monotonic() - start, model_load_seconds(result))
+            return result
+        except Exception:
+            backend.record_failure()
+            raise
+        finally:
+            backend.release()
+    
+    async def astream_generate(self, payload: Dict, backend: Optional[OllamaBackend] = None) -> AsyncIterator[Dict]:
+        backend = backend or self.select()
+        backend.acquire()
+        start = time.monotonic()
+        
+        try:
+            async with aclosing(backend.client.astream_generate(payload)) as chunks:
+                first = True
+                async for chunk in chunks:
+                    if first:
+                        self.first_token.observe(time.monotonic() - start)
+                        first = False
+                    if chunk.get("done"):
+                        backend.record_success(time.monotonic() - start, model_load_seconds(chunk))
+                    yield chunk
+        except Exception:
+            backend.record_failure()
+            raise
+        finally:
+            backend.release()
+    
+    def hedge_delay(self) -> float:
+        if self.first_token.count < settings.llm_hedge_min_samples:
+            return settings.llm_hedge_initial_delay_seconds
+        
+        observed = self.first_token.percentile(settings.llm_hedge_percentile)
+        return max(observed, settings.llm_hedge_min_delay_seconds)
+    
+    async def astream_generate_hedged(self, payload: Dict) -> AsyncIterator[Dict]:
+        primary = self.select()
+        streams = {primary: self.astream_generate(payload, backend=primary)}
+        pending = {asyncio.ensure_future(anext(streams[primary])): primary}
+        
+        winner = None
+        first_chunk = None
+        error: Optional[BaseException] = None
+        
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            
+            if not done and len(self.backends) > 1:
+                secondary = self.select(exclude=[primary])
+                self.hedges += 1
+                logger.info(f"Hedging Ollama request from {primary.base_url} to {secondary.base_url}")
+                
+                streams[secondary] = self.astream_generate(payload, backend=secondary)
+                pending[asyncio.ensure_future(anext(streams[secondary]))] = secondary
+            
+            while pending and winner is None:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = backend
+                        first_chunk = task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            
+            for backend, stream in streams.items():
+                if backend is not winner:
+                    await stream.aclose()
+        
+        if winner is None:
+            raise error
+        
+        if winner is not primary:
+            self.hedge_wins += 1
+        
+        async with aclosing(streams[winner]) as chunks:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+    
+    async def check_backends(self):
+        results = await asyncio.gather(*(
+            backend.client.aping(timeout=settings.ollama_connect_timeout_seconds)
+            for backend in self.backends
+        ))
+        
+        for backend, healthy in zip(self.backends, results):
+            if not healthy:
+                backend.record_failure()
+            elif backend.eject_reason and backend.is_available():
+                backend.reinstate()
+    
+    def start_health_checks(self):
+        if self._health_task is None:
+            self._health_task = asyncio.get_running_loop().create_task(self._health_check_loop())
+    
+    async def stop_health_checks(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+    
+    def get_stats(self) -> List[Dict]:
+        return [backend.get_stats() for backend in self.backends]
+    
+    def get_hedging_stats(self) -> Dict:
+        return {
+            "enabled": settings.llm_hedging_enabled,
+            "delay_seconds": round(self.hedge_delay(), 4),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "first_token": self.first_token.snapshot()
+        }
+    
+    async def aclose(self):
+        await self.stop_health_checks()
+        for backend in self.backends:
+            await backend.client.aclose()
+            backend.client.close()
+    
+    async def _health_check_loop(self):
+        while True:
+            try:
+                await self.check_backends()
+            except Exception as e:
+                logger.error(f"Ollama health check loop failed: {e}")
+            await asyncio.sleep(settings.ollama_health_check_interval_seconds)
@@ -0,0 +1,100 @@
+from app.config import settings
+from app.llm.router import OllamaRouter, OllamaBackend, model_load_seconds
+from typing import Callable, Dict, List, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmer:
+    
+    def __init__(
+        self,
+        router: OllamaRouter,
+        build_payloads: Callable[[], List[Dict]],
+        refresh_seconds: float
+    ):
+        self.router = router
+        self.build_payloads = build_payloads
+        self.refresh_seconds = refresh_seconds
+        self._task: Optional[asyncio.Task] = None
+        
+        self.warmups = 0
+        self.failures = 0
+        self.last_load_seconds: Dict[str, float] = {}
+    
+    async def warm_backend(self, backend: OllamaBackend) -> bool:
+        warmed = True
+        
+        for payload in self.build_payloads():
+            start = time.monotonic()
+            
+            try:
+                result = await backend.client.agenerate(payload)
+            except Exception as e:
+                self.failures += 1
+                warmed = False
+                logger.warning(f"Warmup of {payload['model']} failed on {backend.base_url}: {e}")
+                continue
+            
+            self.warmups += 1
+            self.last_load_seconds[f"{backend.base_url}/{payload['model']}"] = round(model_load_seconds(result), 4)
+            
+            logger.info(
+                f"Warmed {payload['model']} on {backend.base_url} in {time.monotonic() - start:.2f}s "
+                f"(load {model_load_seconds(result):.2f}s)"
+            )
+        
+        backend.last_used = time.monotonic()
+        return warmed
+    
+    async def warm_all(self):
+        await asyncio.gather(*(
+            self.warm_backend(backend)
+            for backend in self.router.backends
+            if backend.is_available()
+        ))
+    
+    async def refresh_idle(self):
+        now = time.monotonic()
+        idle = [
+            backend for backend in self.router.backends
+            if backend.is_available() and now - backend.last_used >= self.refresh_seconds
+        ]
+        
+        if idle:
+            await asyncio.gather(*(self.warm_backend(backend) for backend in idle))
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": settings.ollama_warmup_enabled,
+            "keep_alive": settings.ollama_keep_alive,
+            "warmups": self.warmups,
+            "failures": self.failures,
+            "last_load_seconds": dict(self.last_load_seconds)
+        }
+    
+    async def _refresh_loop(self):
+        await self.warm_all()
+        
+        while True:
+            await asyncio.sleep(self.refresh_seconds / 2)
+            try:
+                await self.refresh_idle()
+            except Exception as e:
+                logger.error(f"Model keep-alive refresh failed: {e}")
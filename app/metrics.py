@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Dict, Optional, Sequence
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, window: int = 1024):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        with self._lock:
+            self._count += 1
+            self._sum += seconds
+            self._recent.append(seconds)
+            
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self._counts[i] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+    
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._recent)
+        
+        if not samples:
+            return None
+        
+        index = min(int(round(q / 100 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+    
+    @property
+    def count(self) -> int:
+        return self._count
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            count = self._count
+            total = self._sum
+            counts = list(self._counts)
+        
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound:g}"] = cumulative
+        buckets["le_inf"] = cumulative + counts[-1]
+        
+        return {
+            "count": count,
+            "mean": round(total / count, 4) if count else None,
+            "p50": self._rounded(self.percentile(50)),
+            "p95": self._rounded(self.percentile(95)),
+            "p99": self._rounded(self.percentile(99)),
+            "buckets": buckets
+        }
+    
+    @staticmethod
+    def _rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 4) if value is not None else None
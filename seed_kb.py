@@ -1,4 +1,5 @@
 from app.agents.retrieval_agent import RetrievalAgent
+from app.config import settings
 import logging
 
 logging.basicConfig(level="INFO")
@@ -44,7 +45,7 @@ def seed_knowledge_base():
         agent = RetrievalAgent()
         agent.index_knowledge_base(kb_documents)
         
-        logger.info(f"Successfully indexed {len(kb_documents)} documents to Pinecone")
+        logger.info(f"Successfully indexed {len(kb_documents)} documents to {settings.kb_backend} knowledge base")
         
         test_query = "how to reset password"
         results = agent.retrieve_relevant_documents(test_query, top_k=2)
@@ -1,6 +1,30 @@
 import pytest
-from app.agents.azure_nlp_agent import AzureNLPAgent
-from app.schemas.ticket import TicketPriority
+from app.config import settings
+from app.agents.azure_nlp_agent import (
+    AzureNLPAgent,
+    ENTITY_BATCH_LIMIT,
+    SENTIMENT_BATCH_LIMIT,
+    KEY_PHRASE_BATCH_LIMIT
+)
+from app.agents.keyword_matcher import KeywordMatcher, load_keyword_tables
+from app.agents.context_packer import ContextPacker
+from app.agents.drafting_agent import _PROMPT_PREFIX
+from app.agents.supervisor import SupervisorAgent
+from app.agents.local_intent_classifier import LocalIntentClassifier, TieredIntentClassifier
+from app.cache.nlp_cache import NLPAnalysisCache
+from app.cache.response_cache import SemanticResponseCache
+from app.llm.admission import AdmissionController, AdmissionRejected
+from app.llm.breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from app.llm.budgets import GenerationBudgets
+from app.llm.cascade import ModelCascade, SMALL_TIER, LARGE_TIER
+from app.llm.ollama_client import OllamaClient
+from app.llm.router import OllamaRouter
+from app.schemas.response import KBDocument
+from app.schemas.ticket import TicketPriority, TicketIntentClassification
+from types import SimpleNamespace
+import numpy as np
+import asyncio
+import time
 
 
 @pytest.fixture
@@ -8,6 +32,11 @@ def azure_agent():
     return AzureNLPAgent()
 
 
+@pytest.fixture(scope="module")
+def supervisor():
+    return SupervisorAgent()
+
+
 def test_password_reset_intent(azure_agent):
     result = azure_agent.analyze_ticket(
         title="Can't login",
@@ -35,3 +64,402 @@ def test_entity_extraction(azure_agent):
     )
     
     assert isinstance(result.entities, list)
+
+
+def test_keyword_matcher_scores_all_groups_in_one_pass():
+    matcher = KeywordMatcher(load_keyword_tables())
+    
+    scores = matcher.match(["Forgot password", "login page is down"])
+    
+    assert scores["intents"]["password_reset"] == 3
+    assert "urgent" in scores["priority"]
+    assert "high" not in scores["priority"]
+
+
+def test_keyword_matcher_does_not_match_across_phrases():
+    matcher = KeywordMatcher({"intents": {"technical_issue": ["not working"]}})
+    
+    assert matcher.match(["is not", "working fine"])["intents"] == {}
+    assert matcher.match(["vpn not working"])["intents"] == {"technical_issue": 1}
+
+
+def test_azure_batch_analysis_respects_per_request_limits(azure_agent):
+    calls = {"entities": [], "sentiment": [], "key_phrases": []}
+    
+    def respond(name, **fields):
+        def call(chunk):
+            calls[name].append(len(chunk))
+            return [SimpleNamespace(is_error=False, **fields) for _ in chunk]
+        return call
+    
+    azure_agent.analysis_mode = "concurrent"
+    azure_agent.cache = None
+    azure_agent.client.recognize_entities = respond("entities", entities=[])
+    azure_agent.client.analyze_sentiment = respond("sentiment", sentiment="negative")
+    azure_agent.client.extract_key_phrases = respond("key_phrases", key_phrases=["forgot password"])
+    
+    tickets = [{"title": f"Ticket {i}", "description": "I forgot my password"} for i in range(12)]
+    results = azure_agent.analyze_tickets(tickets)
+    
+    assert calls["entities"] == [ENTITY_BATCH_LIMIT, ENTITY_BATCH_LIMIT, 2]
+    assert calls["sentiment"] == [SENTIMENT_BATCH_LIMIT, 2]
+    assert calls["key_phrases"] == [KEY_PHRASE_BATCH_LIMIT, 2]
+    assert len(results) == 12
+    assert all(result.intent == "password_reset" for result in results)
+    assert all(result.priority == TicketPriority.URGENT for result in results)
+
+
+def test_nlp_cache_keys_on_normalized_ticket_text():
+    cache = NLPAnalysisCache(max_entries=10, ttl_seconds=60)
+    classification = TicketIntentClassification(
+        intent="password_reset",
+        confidence=0.8,
+        entities=[],
+        sentiment="neutral",
+        priority=TicketPriority.MEDIUM
+    )
+    
+    cache.set("Can't login", "I forgot   my password", classification)
+    
+    assert cache.get("can't LOGIN", "I forgot my\npassword") == classification
+    assert cache.get("Can't login", "I forgot my username") is None
+    assert NLPAnalysisCache.make_key("a", "b c") != NLPAnalysisCache.make_key("a b", "c")
+    
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+class KeywordEmbedder:
+    
+    VOCABULARY = ["password", "vpn", "invoice"]
+    
+    def embed_batch(self, texts):
+        return np.array([[text.lower().count(word) for word in self.VOCABULARY] + [0.1] for text in texts], dtype=np.float32)
+
+
+def test_local_intent_classifier_uses_centroid_margin(azure_agent):
+    local = LocalIntentClassifier(KeywordEmbedder(), {
+        "password_reset": ["reset my password", "password expired"],
+        "technical_issue": ["vpn is down", "vpn keeps dropping"],
+        "billing": ["wrong invoice", "invoice missing"]
+    })
+    
+    intent, score, margin = local.predict("I forgot my password")
+    assert intent == "password_reset"
+    assert margin > 0.5
+    
+    calls = []
+    azure_agent.cache = NLPAnalysisCache(max_entries=10, ttl_seconds=60)
+    azure_agent.client = SimpleNamespace(
+        analyze_sentiment=lambda chunk: calls.append("sentiment") or [],
+        recognize_entities=lambda chunk: calls.append("entities") or [],
+        extract_key_phrases=lambda chunk: calls.append("key_phrases") or []
+    )
+    
+    classifier = TieredIntentClassifier(azure_agent, local, mode="tiered", margin_threshold=0.2)
+    result, source = classifier.analyze("Locked out", "I forgot my password and I am furious")
+    
+    assert source == "local_intent_classifier"
+    assert result.intent == "password_reset"
+    assert result.sentiment == "negative"
+    assert result.priority == TicketPriority.URGENT
+    assert calls == []
+    
+    cached = TicketIntentClassification(
+        intent="account_issue",
+        confidence=0.9,
+        entities=[],
+        sentiment="neutral",
+        priority=TicketPriority.MEDIUM
+    )
+    azure_agent.cache.set("Locked out", "I forgot my password again", cached)
+    
+    result, _ = classifier.analyze("Locked out", "I forgot my password again")
+    assert result == cached
+    assert calls == []
+    assert azure_agent.cache.get_stats()["memory_hits"] == 1
+    
+    _, _, margin = local.predict("password and vpn")
+    assert margin < 0.2
+
+
+def test_sync_process_ticket_reuses_one_event_loop(supervisor, monkeypatch):
+    loops = []
+    
+    async def process(ticket_id, title, description):
+        loops.append(asyncio.get_running_loop())
+        return ticket_id
+    
+    monkeypatch.setattr(supervisor, "aprocess_ticket", process)
+    
+    assert supervisor.process_ticket("T-1", "VPN down", "The VPN disconnects") == "T-1"
+    assert supervisor.process_ticket("T-2", "VPN down", "The VPN disconnects") == "T-2"
+    assert loops[0] is loops[1]
+    assert loops[0].is_running()
+
+
+def test_parallel_retrieval_filters_candidates_once_intent_is_known(supervisor):
+    candidates = [
+        {"id": "vpn-1", "score": 0.9, "text": "Restart the VPN client", "category": "technical_issue"},
+        {"id": "password-1", "score": 0.85, "text": "Use Forgot Password", "category": "password_reset"},
+        {"id": "vpn-2", "score": 0.5, "text": "Check the firewall", "category": "technical_issue"}
+    ]
+    
+    update = asyncio.run(supervisor._filter_documents_node({
+        "ticket_id": "T-1",
+        "kb_candidates": candidates,
+        "intent": "technical_issue"
+    }))
+    
+    assert [doc.doc_id for doc in update["kb_documents"]] == ["vpn-1"]
+    assert update["agent_decisions"][0].output["num_documents"] == 1
+
+
+def test_stream_ticket_emits_events_in_order(supervisor, monkeypatch):
+    async def analyze(state):
+        return {"intent": "technical_issue", "confidence": 0.9, "sentiment": "neutral", "priority": "medium"}
+    
+    async def retrieve(state):
+        return {"kb_documents": [KBDocument(doc_id="vpn-1", content="Restart the VPN client", similarity_score=0.9, metadata={})]}
+    
+    async def stream_response(**kwargs):
+        for token in ["Restart ", "the VPN client."]:
+            yield token
+    
+    monkeypatch.setattr(supervisor, "parallel_retrieval", False)
+    monkeypatch.setattr(supervisor, "_analyze_ticket_node", analyze)
+    monkeypatch.setattr(supervisor, "_retrieve_documents_node", retrieve)
+    monkeypatch.setattr(supervisor, "_lookup_cached_response", lambda state: None)
+    monkeypatch.setattr(supervisor, "_store_cached_response", lambda *args: None)
+    monkeypatch.setattr(supervisor.drafting, "astream_response", stream_response)
+    
+    async def collect():
+        return [event async for event in supervisor.astream_ticket("T-3", "VPN down", "The VPN disconnects")]
+    
+    events = asyncio.run(collect())
+    
+    assert [name for name, _ in events] == ["analysis", "retrieval", "token", "token", "complete"]
+    assert events[1][1]["doc_ids"] == ["vpn-1"]
+    assert events[-1][1].draft_text == "Restart the VPN client."
+
+
+def test_ollama_client_reuses_async_pool_per_event_loop():
+    client = OllamaClient("http://ollama:11434")
+    
+    async def get_twice():
+        return client._get_async_client(), client._get_async_client()
+    
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    
+    third, _ = asyncio.run(get_twice())
+    assert third is not first
+    
+    client.close()
+
+
+def test_response_cache_lookup_and_invalidation():
+    cache = SemanticResponseCache(max_distance=0.05, ttl_seconds=60, max_entries=10)
+    docs = [KBDocument(doc_id="vpn-1", content="Restart the VPN client", similarity_score=0.9, metadata={})]
+    edited = [docs[0].model_copy(update={"content": "Reinstall the VPN client"})]
+    
+    cache.store(np.array([1.0, 0.0]), docs, "Restart the VPN client.", 0.8, "T-1")
+    
+    hit = cache.lookup(np.array([0.99, 0.05]), docs)
+    assert hit["draft_text"] == "Restart the VPN client."
+    assert hit["source_ticket_id"] == "T-1"
+    
+    assert cache.lookup(np.array([0.0, 1.0]), docs) is None
+    assert cache.lookup(np.array([1.0, 0.0]), edited) is None
+    
+    cache.invalidate_documents(["vpn-1"])
+    assert cache.lookup(np.array([1.0, 0.0]), docs) is None
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_router_prefers_least_outstanding_and_skips_ejected_backends():
+    router = OllamaRouter(["http://ollama-a:11434", "http://ollama-b:11434"])
+    first, second = router.backends
+    
+    first.acquire()
+    assert router.select() is second
+    first.release()
+    
+    for _ in range(settings.ollama_eject_after_failures):
+        second.record_failure()
+    
+    assert not second.is_available()
+    assert router.available_count() == 1
+    
+    second.acquire()
+    second.acquire()
+    first.acquire()
+    assert router.select() is first
+    
+    for backend in router.backends:
+        backend.client.close()
+
+
+def test_admission_serves_higher_priority_first_and_rejects_late_requests():
+    controller = AdmissionController(lambda: 1, deadline_seconds=1.0, initial_service_seconds=0.1)
+    order = []
+    
+    async def job(name, priority):
+        async with controller.admit(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+    
+    async def run():
+        holder = asyncio.create_task(job("holder", "low"))
+        await asyncio.sleep(0)
+        
+        queued = [asyncio.create_task(job(name, name)) for name in ["low", "medium", "urgent", "high"]]
+        await asyncio.sleep(0)
+        
+        controller.check("urgent")
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.check("low", deadline_seconds=0.2)
+        
+        await asyncio.gather(holder, *queued)
+        return rejected.value
+    
+    rejected = asyncio.run(run())
+    
+    assert order == ["holder", "urgent", "high", "medium", "low"]
+    assert rejected.retry_after > 0.2
+    assert controller.get_stats()["rejected"] == 1
+
+
+class SentenceEmbedder:
+    
+    def embed(self, text):
+        return np.array([1.0, 0.0])
+    
+    def embed_batch(self, texts):
+        vectors = {"Restart": [1.0, 0.0], "Reconnect": [0.8, 0.6]}
+        return np.array([vectors.get(text.split()[0], [0.0, 1.0]) for text in texts])
+
+
+def test_context_packer_keeps_context_that_fits_and_truncates_when_nothing_does():
+    docs = [
+        KBDocument(doc_id="vpn-1", content="Restart the VPN client. Lunch is at noon.", similarity_score=0.9, metadata={}),
+        KBDocument(doc_id="vpn-2", content="Reconnect to the VPN gateway.", similarity_score=0.8, metadata={})
+    ]
+    
+    assert ContextPacker(SentenceEmbedder(), token_budget=100).pack("VPN down", docs) is docs
+    
+    packed = ContextPacker(SentenceEmbedder(), token_budget=14).pack("VPN down", docs)
+    assert [doc.doc_id for doc in packed] == ["vpn-1", "vpn-2"]
+    assert "Lunch" not in packed[0].content
+    
+    truncated = ContextPacker(SentenceEmbedder(), token_budget=2).pack("VPN down", docs)
+    assert len(truncated) == 1
+    assert truncated[0].content == "Restart "
+
+
+def test_warmup_primes_the_shared_prompt_prefix(supervisor, monkeypatch):
+    drafting = supervisor.drafting
+    backend = drafting.router.backends[0]
+    payloads = []
+    
+    async def agenerate(payload):
+        payloads.append(payload)
+        return {"response": "", "load_duration": 2_000_000_000}
+    
+    monkeypatch.setattr(backend.client, "agenerate", agenerate)
+    
+    assert asyncio.run(drafting.warmer.warm_backend(backend))
+    assert payloads and all(payload["prompt"] == _PROMPT_PREFIX for payload in payloads)
+    assert all(payload["keep_alive"] == settings.ollama_keep_alive for payload in payloads)
+    assert drafting.warmer.last_load_seconds[f"{backend.base_url}/{payloads[0]['model']}"] == 2.0
+    
+    prompt = drafting._build_prompt("VPN down", "The VPN disconnects", "technical_issue", [])
+    assert prompt.startswith(_PROMPT_PREFIX)
+
+
+def make_cascade(small_model):
+    return ModelCascade(
+        small_model=small_model,
+        large_model="llama3.1:8b",
+        simple_intents=["password_reset"],
+        large_priorities=["urgent"],
+        min_similarity=0.7,
+        escalation_threshold=0.6
+    )
+
+
+def test_cascade_routes_simple_tickets_to_the_small_model():
+    cascade = make_cascade("llama3.2:1b")
+    docs = [KBDocument(doc_id="password-1", content="Use Forgot Password", similarity_score=0.85, metadata={})]
+    
+    assert cascade.choose_tier("password_reset", docs, "medium") == SMALL_TIER
+    assert cascade.choose_tier("password_reset", docs, "urgent") == LARGE_TIER
+    assert cascade.choose_tier("technical_issue", docs, "medium") == LARGE_TIER
+    assert cascade.choose_tier("password_reset", [docs[0].model_copy(update={"similarity_score": 0.5})], "medium") == LARGE_TIER
+    
+    assert cascade.should_escalate(SMALL_TIER, 0.4)
+    assert not cascade.should_escalate(SMALL_TIER, 0.8)
+    assert not cascade.should_escalate(LARGE_TIER, 0.4)
+    
+    assert make_cascade(None).choose_tier("password_reset", docs, "medium") == LARGE_TIER
+
+
+def test_generation_budgets_follow_observed_draft_lengths():
+    budgets = GenerationBudgets(
+        default_tokens=200,
+        min_tokens=32,
+        percentile=100,
+        margin=0.5,
+        min_samples=3,
+        history_limit=100,
+        refresh_seconds=60
+    )
+    history = (
+        [("password_reset", "x" * 160)] * 3
+        + [("technical_issue", "x" * 1000)] * 3
+        + [("billing", "x" * 20)] * 3
+        + [("account_access", "x" * 160)] * 2
+        + [("account_access", "")] * 2
+    )
+    
+    budgets.budgets = budgets.compute_budgets(history)
+    
+    assert budgets.budgets == {"password_reset": 60, "technical_issue": 200, "billing": 32}
+    assert budgets.samples["account_access"] == 2
+    assert budgets.budget_for("account_access") == 200
+    assert budgets.budget_for(None) == 200
+
+
+def test_circuit_breaker_opens_on_failures_and_closes_after_probes():
+    breaker = CircuitBreaker(
+        window_size=4,
+        min_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=10.0,
+        slow_call_rate_threshold=1.0,
+        open_seconds=0.05,
+        half_open_probes=2
+    )
+    
+    def call(fail):
+        with breaker.guard():
+            if fail:
+                raise RuntimeError("Ollama unavailable")
+    
+    for _ in range(2):
+        call(False)
+        with pytest.raises(RuntimeError):
+            call(True)
+    
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        call(False)
+    
+    time.sleep(0.06)
+    call(False)
+    assert breaker.state == HALF_OPEN
+    
+    call(False)
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()["rejected"] == 1
@@ -1,6 +1,17 @@
 import pytest
 from app.embeddings.embed import EmbeddingGenerator
 from app.embeddings.pinecone_client import PineconeClient
+from app.embeddings.local_index import LocalVectorIndex
+from app.embeddings.ivf_index import IVFVectorIndex
+from app.embeddings.pinecone_client import iter_upsert_chunks
+from app.kb.ingest import iter_documents
+from app.embeddings.batcher import EmbeddingBatcher
+from app.cache.embedding_cache import EmbeddingCache
+from app.kb.manifest import KBManifest, chunk_document, content_hash
+import numpy as np
+import asyncio
+import threading
+import os
 
 
 @pytest.fixture
@@ -63,3 +74,169 @@ def test_pinecone_upsert_and_query(pinecone_client, embedding_generator):
     assert len(results) == 1
     assert results[0]["id"] == "doc1"
     assert results[0]["score"] > 0.6
+
+
+def test_local_index_category_filter_and_persistence(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3, 384)).astype(np.float32)
+    
+    index = LocalVectorIndex(str(tmp_path))
+    index.initialize_index(dimension=384)
+    index.upsert_documents([
+        {"id": "doc1", "text": "Reset password", "embedding": vectors[0].tolist(), "category": "password_reset"},
+        {"id": "doc2", "text": "VPN issues", "embedding": vectors[1].tolist(), "category": "technical_issue"},
+        {"id": "doc3", "text": "Email issues", "embedding": vectors[2].tolist(), "category": "technical_issue"}
+    ])
+    
+    results = index.query(vectors[0].tolist(), top_k=3)
+    assert results[0]["id"] == "doc1"
+    assert results[0]["score"] > 0.99
+    
+    filtered = index.query(vectors[0].tolist(), top_k=3, filter={"category": {"$eq": "technical_issue"}})
+    assert {result["id"] for result in filtered} == {"doc2", "doc3"}
+    
+    reloaded = LocalVectorIndex(str(tmp_path))
+    reloaded.initialize_index(dimension=384)
+    assert reloaded.get_stats()["total_vector_count"] == 3
+    assert reloaded.query(vectors[1].tolist(), top_k=1)[0]["id"] == "doc2"
+
+
+def test_ivf_index_incremental_insert_and_recall(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(600, 384)).astype(np.float32)
+    
+    index = IVFVectorIndex(str(tmp_path), nlist=8, nprobe=8, rescore_factor=4, train_min_vectors=200)
+    index.initialize_index(dimension=384)
+    for start in range(0, 600, 150):
+        index.upsert_documents([
+            {"id": f"doc{i}", "text": f"text {i}", "embedding": vectors[i].tolist(), "category": "technical_issue"}
+            for i in range(start, start + 150)
+        ])
+    
+    assert index.get_stats()["trained"]
+    assert index.query(vectors[42].tolist(), top_k=1)[0]["id"] == "doc42"
+    
+    report = index.recall_report(num_queries=20, top_k=5, nprobe_values=(8,))
+    assert report["ivf"][0]["recall"] == 1.0
+    
+    reloaded = IVFVectorIndex(str(tmp_path), nlist=8, nprobe=8, rescore_factor=4, train_min_vectors=200)
+    reloaded.initialize_index(dimension=384)
+    assert reloaded.query(vectors[500].tolist(), top_k=1)[0]["id"] == "doc500"
+
+
+def test_onnx_engine_parity_with_pytorch(embedding_generator, tmp_path):
+    pytest.importorskip("optimum.onnxruntime")
+    from app.embeddings.onnx_engine import OnnxEmbeddingEngine, check_parity
+    
+    corpus_path = os.path.join(os.path.dirname(__file__), "fixtures", "embedding_corpus.txt")
+    with open(corpus_path) as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    
+    engine = OnnxEmbeddingEngine("all-MiniLM-L6-v2", path=str(tmp_path))
+    report = check_parity(embedding_generator.model, engine, corpus)
+    
+    assert engine.get_sentence_embedding_dimension() == 384
+    assert report["min_cosine"] > 0.97
+
+
+def test_ingest_reads_kb_files_and_chunks_upserts(tmp_path):
+    (tmp_path / "password_reset").mkdir()
+    (tmp_path / "password_reset" / "reset.md").write_text("Click 'Forgot Password' on the login page.")
+    (tmp_path / "faq.jsonl").write_text('{"id": "faq-1", "text": "Restart the VPN client."}\nnot json\n{"text": "Clear the browser cache."}\n')
+    (tmp_path / "index").mkdir()
+    (tmp_path / "index" / "notes.txt").write_text("index files are skipped")
+    
+    docs = list(iter_documents(str(tmp_path)))
+    
+    assert [doc["id"] for doc in docs] == ["faq-1", "faq.jsonl:3", "password_reset/reset.md"]
+    assert docs[2]["category"] == "password_reset"
+    assert docs[0]["category"] == "general"
+    
+    vectors = [{"id": str(i), "text": "x" * 1000, "embedding": np.zeros(384)} for i in range(250)]
+    chunks = list(iter_upsert_chunks(vectors, max_vectors=100, max_bytes=200_000))
+    
+    assert sum(len(chunk) for chunk in chunks) == 250
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert len(chunks) > 3
+
+
+def test_manifest_diff_only_returns_changed_chunks(tmp_path):
+    doc = {"id": "guide.md", "text": "Step one.\n\nStep two.", "source": "guide.md", "category": "general"}
+    chunks = chunk_document(doc, max_chars=12)
+    
+    manifest = KBManifest(str(tmp_path / "manifest.json"), model="test-model")
+    manifest.load()
+    changed, removed = manifest.diff(doc["id"], content_hash(doc["text"]), chunks)
+    assert len(changed) == 2 and not removed
+    
+    manifest.save({doc["id"]: {"hash": content_hash(doc["text"]), "chunks": [chunk["id"] for chunk in chunks]}}, dimension=384)
+    
+    reloaded = KBManifest(str(tmp_path / "manifest.json"), model="test-model")
+    reloaded.load()
+    assert reloaded.diff(doc["id"], content_hash(doc["text"]), chunks) == ([], set())
+    
+    edited = {**doc, "text": "Step one.\n\nStep 2."}
+    edited_chunks = chunk_document(edited, max_chars=12)
+    changed, removed = reloaded.diff(doc["id"], content_hash(edited["text"]), edited_chunks)
+    
+    assert [chunk["text"] for chunk in changed] == ["Step 2."]
+    assert removed == {chunks[1]["id"]}
+
+
+def test_local_index_delete_documents(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.initialize_index(dimension=4)
+    index.upsert_documents([
+        {"id": f"doc-{i}", "text": f"text {i}", "embedding": np.eye(4)[i], "category": "general"}
+        for i in range(4)
+    ])
+    
+    index.delete_documents(["doc-1", "doc-3", "missing"])
+    
+    reloaded = LocalVectorIndex(str(tmp_path))
+    reloaded.initialize_index(dimension=4)
+    assert reloaded.get_stats()["total_vector_count"] == 2
+    assert {result["id"] for result in reloaded.query(np.eye(4)[0], top_k=4)} == {"doc-0", "doc-2"}
+
+
+def test_batcher_survives_cancelled_waiter():
+    release = threading.Event()
+    
+    def encode(texts):
+        release.wait(timeout=5)
+        return np.ones((len(texts), 4), dtype=np.float32)
+    
+    batcher = EmbeddingBatcher(encode=encode, max_batch_size=8, max_wait_ms=1)
+    
+    async def cancel_waiter():
+        task = asyncio.ensure_future(batcher.aembed("disconnected client"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(cancel_waiter())
+    release.set()
+    
+    async def embed_after_cancel():
+        return await asyncio.wait_for(batcher.aembed("next query"), timeout=5)
+    
+    assert asyncio.run(embed_after_cancel()).shape == (4,)
+    assert batcher.embed("sync query").shape == (4,)
+    assert batcher._thread.is_alive()
+
+
+def test_embedding_cache_persists_batches_per_dtype(tmp_path):
+    vectors = np.eye(4, dtype=np.float32)[:2]
+    
+    cache = EmbeddingCache("test-model", dimension=4, max_entries=10, path=str(tmp_path), dtype="float16")
+    cache.set_many(["kb article", "another article"], vectors)
+    cache.set("one-off ticket query", vectors[0], persist=False)
+    
+    reloaded = EmbeddingCache("test-model", dimension=4, max_entries=10, path=str(tmp_path), dtype="float16")
+    found = reloaded.get_many(["kb article", "one-off ticket query"])
+    assert np.allclose(found[0], vectors[0])
+    assert found[1] is None
+    
+    switched = EmbeddingCache("test-model", dimension=4, max_entries=10, path=str(tmp_path), dtype="float32")
+    assert switched.get("kb article") is None